@@ -0,0 +1,179 @@
+# async_main.py
+# Runs the bot on AsyncTeleBot: every update is a task on one event loop instead of a thread.
+# Start with `python async_main.py`; main.py remains the threaded (polling/webhook) runtime.
+import asyncio
+from datetime import datetime
+import config
+from client import create_async_bot
+from router import CallbackRouter
+from middleware import create_async_rate_limit_middleware
+from metrics import timed, start_metrics_server
+from db import init_db, add_user, get_user, log_admin_action, unblock_user, load_unclaimed_keys, load_authorization
+from broadcast import resume_broadcasts
+from handlers.main_menu import TUTORIAL_TEXT
+from handlers.referral import extract_referral_code, get_referral_link
+from handlers.admin import is_admin, generate_keys, send_keys, queue_keys, GEN_MAX_KEYS
+from handlers.aio import run_db
+from handlers.aio.verification import init_verification, send_verification_message, handle_verification_callback
+from handlers.aio.main_menu import send_main_menu
+from handlers.aio.referral import process_verified_referral, send_referral_menu
+from handlers.rewards import parse_rewards_page, REWARDS_PAGE_PREFIX
+from handlers.aio.rewards import send_rewards_menu, handle_rewards_page, handle_platform_selection, claim_account
+from handlers.aio.account_info import send_account_info
+from handlers.aio.review import prompt_review, is_awaiting_review, process_review
+from handlers.aio.redeem import handle_redeem_command
+from handlers.aio.admin import send_admin_menu, register_admin_routes, handle_stats_command, is_awaiting_stock_upload, process_stock_upload, handle_broadcast_command
+
+bot = create_async_bot()
+router = CallbackRouter(bot)
+bot.setup_middleware(create_async_rate_limit_middleware(bot, router))
+
+def register_user(message, pending_ref):
+    user_id = str(message.from_user.id)
+    user = get_user(user_id)
+    if not user:
+        add_user(user_id,
+                 message.from_user.username or message.from_user.first_name,
+                 datetime.now().strftime("%Y-%m-%d"),
+                 pending_referrer=pending_ref)
+    elif user.blocked:
+        unblock_user(user_id)
+
+@bot.message_handler(commands=["start"])
+@timed("handler")
+async def start_command(message):
+    await run_db(register_user, message, extract_referral_code(message))
+    await send_verification_message(bot, message)
+
+@bot.message_handler(commands=["gen"])
+@timed("handler")
+async def gen_command(message):
+    user_id = str(message.from_user.id)
+
+    # Only admins can generate keys
+    if not is_admin(user_id):
+        await bot.reply_to(message, "🚫 You do not have permission to generate keys.")
+        return
+
+    parts = message.text.split()
+    if len(parts) < 3:
+        await bot.reply_to(message, "Usage: /gen <normal|premium> <quantity>")
+        return
+
+    key_type = parts[1].lower()
+    try:
+        qty = int(parts[2])
+    except ValueError:
+        await bot.reply_to(message, "Quantity must be a number.")
+        return
+    if not 0 < qty <= GEN_MAX_KEYS:
+        await bot.reply_to(message, f"Quantity must be between 1 and {GEN_MAX_KEYS}.")
+        return
+
+    generated = await run_db(generate_keys, key_type, qty)
+    if generated is None:
+        await bot.reply_to(message, "Key type must be either 'normal' or 'premium'.")
+        return
+
+    await send_keys(bot, message.chat.id, "Generated keys:", generated, key_type, reply_to_message_id=message.message_id)
+
+    # Log the admin action and notify owners
+    await run_db(log_admin_action, user_id, f"Generated {len(generated)} {key_type} keys")
+    for owner in config.OWNERS:
+        queue_keys(bot, owner, f"Admin {message.from_user.username} has generated keys:", generated, key_type)
+
+@bot.message_handler(commands=["redeem"])
+@timed("handler")
+async def redeem_command(message):
+    await handle_redeem_command(bot, message)
+
+@bot.message_handler(commands=["broadcast"])
+@timed("handler")
+async def broadcast_command(message):
+    await handle_broadcast_command(bot, message)
+
+@bot.message_handler(commands=["stats"])
+@timed("handler")
+async def stats_command(message):
+    await handle_stats_command(bot, message)
+
+@bot.message_handler(commands=["tutorial"])
+@timed("handler")
+async def tutorial_command(message):
+    await bot.send_message(message.chat.id, TUTORIAL_TEXT, parse_mode="HTML")
+
+@bot.message_handler(content_types=["text"], func=is_awaiting_review)
+@timed("handler")
+async def review_reply(message):
+    await process_review(bot, message)
+
+@bot.message_handler(content_types=["document", "text"], func=is_awaiting_stock_upload)
+@timed("handler")
+async def stock_upload_reply(message):
+    await process_stock_upload(bot, message)
+
+@router.exact("back_main")
+async def callback_back_main(call):
+    await send_main_menu(bot, call.message)
+
+@router.exact("get_ref_link")
+async def callback_get_ref_link(call):
+    ref_link = get_referral_link(call.from_user.id)
+    await bot.answer_callback_query(call.id, "Referral link generated!")
+    await bot.send_message(call.message.chat.id, f"Your referral link:\n{ref_link}", parse_mode="HTML")
+
+@router.exact("menu_rewards")
+async def callback_menu_rewards(call):
+    await send_rewards_menu(bot, call.message)
+
+@router.prefix(REWARDS_PAGE_PREFIX)
+async def callback_rewards_page(call, page):
+    await handle_rewards_page(bot, call, parse_rewards_page(page))
+
+@router.prefix("reward_")
+async def callback_reward(call, platform):
+    await handle_platform_selection(bot, call, platform)
+
+@router.prefix("claim_")
+async def callback_claim(call, platform):
+    await claim_account(bot, call, platform)
+
+@router.exact("menu_account")
+async def callback_menu_account(call):
+    await send_account_info(bot, call.message)
+
+@router.exact("menu_referral")
+async def callback_menu_referral(call):
+    await send_referral_menu(bot, call.message)
+
+@router.exact("menu_review")
+async def callback_menu_review(call):
+    await prompt_review(bot, call.message)
+
+@router.exact("menu_admin")
+async def callback_menu_admin(call):
+    await send_admin_menu(bot, call.message)
+
+@router.exact("verify")
+async def callback_verify(call):
+    await handle_verification_callback(bot, call)
+    await process_verified_referral(bot, call.from_user.id)
+
+register_admin_routes(router, bot)
+
+# Every callback query goes through the router; handlers and the unknown answer are coroutines
+@bot.callback_query_handler(func=lambda call: True)
+async def callback_entry(call):
+    await router.dispatch(call)
+
+async def main():
+    start_metrics_server()
+    await run_db(init_db)
+    await run_db(load_unclaimed_keys)
+    await run_db(load_authorization)
+    await init_verification(bot)
+    await run_db(resume_broadcasts, bot, asyncio.get_running_loop())
+    await bot.infinity_polling()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,284 @@
+# benchmarks/db_bench.py
+# Microbenchmarks for db.py at production table sizes. Each scale seeds a temporary database
+# with N users, N keys, N stock rows and N/2 referrals, then runs every benchmark for a fixed
+# time single-threaded and with --threads threads (one connection per thread, as in the bot).
+#
+#   python benchmarks/db_bench.py --scales 10000,100000 --save-baseline
+#   python benchmarks/db_bench.py --scales 10000,100000          # fails on regressions or a missing baseline
+#
+# Every measurement is repeated --repeats times and the median is what gets saved and compared.
+# Repeats run in rounds over all benchmarks, so a slow patch on the machine hits one repeat of
+# many benchmarks rather than every repeat of one.
+# A benchmark only counts as a regression when every repeat falls below the tolerance, and runs
+# whose repeats disagree by more than the tolerance are reported as noisy.
+# Baselines are machine specific: record one with --save-baseline on the machine you compare on.
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_baseline.json")
+PLATFORMS = [f"P{i}" for i in range(10)]
+# Small platform the bulk stock writes replace and import into, so they do not drain PLATFORMS
+SCRATCH_PLATFORM = "SCRATCH"
+
+def seed(path, n):
+    """
+    Creates a database at path with n users, n unclaimed keys, n stock rows over PLATFORMS,
+    n/2 referrals, n/10 reviews and admin log rows, n/1000 finished broadcasts, a few channels
+    and admins, and an empty SCRATCH_PLATFORM.
+    """
+    db.close_connection()
+    db.DATABASE = path
+    db.init_db()
+    with db.transaction() as c:
+        c.executemany("INSERT INTO users (telegram_id, username, join_date, points) VALUES (?, ?, '2024-01-01', ?)",
+                      ((str(i), f"user{i}", 10 ** 9) for i in range(1, n + 1)))
+        c.executemany("INSERT INTO keys (key, type, points, claimed) VALUES (?, 'normal', 5, 0)",
+                      ((f"K{i:09d}",) for i in range(n)))
+        c.executemany("INSERT INTO platforms (platform_name) VALUES (?)", ((p,) for p in PLATFORMS + [SCRATCH_PLATFORM]))
+        c.executemany("INSERT INTO stock_items (platform_name, account) VALUES (?, ?)",
+                      ((PLATFORMS[i % len(PLATFORMS)], f"account{i}") for i in range(n)))
+        c.executemany("INSERT OR IGNORE INTO referrals (user_id, referred_id) VALUES (?, ?)",
+                      ((str(i), str(n - i)) for i in range(1, n // 2 + 1)))
+        c.executemany("INSERT INTO reviews (user_id, review) VALUES (?, 'great bot')",
+                      ((str(i),) for i in range(1, n // 10 + 1)))
+        c.executemany("INSERT INTO admin_logs (admin_id, action) VALUES ('1', ?)",
+                      ((f"action {i}",) for i in range(n // 10)))
+        c.executemany("INSERT INTO broadcasts (admin_id, text, chat_id, message_id, total, status) "
+                      "VALUES ('1', 'hello', '1', 1, ?, 'done')", ((n,) for _ in range(max(1, n // 1000))))
+        c.executemany("INSERT INTO channels (channel_link) VALUES (?)",
+                      ((f"https://t.me/channel{i}",) for i in range(4)))
+        c.executemany("INSERT INTO admins (user_id, username, role, banned) VALUES (?, ?, 'admin', 0)",
+                      ((f"a{i}", f"admin{i}") for i in range(20)))
+    db.execute("ANALYZE")
+    # Seeding bypassed the write-through caches
+    db._catalog = None
+    db.clear_user_cache()
+    db.load_unclaimed_keys()
+    db.load_authorization()
+
+def benchmarks(n):
+    """
+    (name, op, consumes) for every db function. op(rng) runs one call; `consumes` marks
+    benchmarks that use up seeded rows, which are capped so a run cannot exhaust them.
+    """
+    counter = itertools.count()
+    user = lambda rng: str(rng.randint(1, n))
+    fresh = lambda prefix: f"{prefix}{next(counter)}"
+    key = lambda: f"K{next(counter) % n:09d}"
+    platform = lambda: PLATFORMS[next(counter) % len(PLATFORMS)]
+    accounts = lambda count: [fresh("stock") for _ in range(count)]
+    broadcast = lambda rng: rng.randint(1, max(1, n // 1000))
+    # Rows the add_* benchmarks create, consumed in order by the matching remove_* benchmarks
+    channel_ids = itertools.count(5)
+    added_admins, removed_admins = itertools.count(), itertools.count()
+
+    def add_remove_platform(rng):
+        name = fresh("bench")
+        db.add_platform(name)
+        db.remove_platform(name)
+
+    return [
+        ("get_user", lambda rng: db.get_user(user(rng)), False),
+        ("add_user", lambda rng: db.add_user(fresh("new"), "bench", "2024-01-01"), False),
+        ("update_user_points", lambda rng: db.update_user_points(user(rng), 1), False),
+        ("get_users", lambda rng: db.get_users(), False),
+        ("update_clear_pending_referral", lambda rng: (db.update_user_pending_referral(user(rng), "1"),
+                                                       db.clear_pending_referral(user(rng))), False),
+        ("ban_unban_user", lambda rng: (db.ban_user(user(rng)), db.unban_user(user(rng))), False),
+        ("mark_users_blocked", lambda rng: db.mark_users_blocked([user(rng) for _ in range(10)]), False),
+        ("unblock_user", lambda rng: db.unblock_user(user(rng)), False),
+        ("count_broadcast_recipients", lambda rng: db.count_broadcast_recipients(), False),
+        ("get_broadcast_recipients", lambda rng: db.get_broadcast_recipients(user(rng), 200), False),
+        ("create_broadcast", lambda rng: db.create_broadcast("1", "bench", "1", 1, n), False),
+        ("get_broadcast", lambda rng: db.get_broadcast(broadcast(rng)), False),
+        ("get_running_broadcasts", lambda rng: db.get_running_broadcasts(), False),
+        ("save_broadcast_progress", lambda rng: db.save_broadcast_progress(broadcast(rng), user(rng), 1, 0, 0, "done"),
+         False),
+        ("add_referral", lambda rng: db.add_referral(user(rng), fresh("ref")), False),
+        ("add_review", lambda rng: db.add_review(user(rng), "benchmark review"), False),
+        ("log_admin_action", lambda rng: db.log_admin_action("1", "benchmark"), False),
+        ("get_key", lambda rng: db.get_key(f"K{rng.randrange(n):09d}"), False),
+        ("get_keys", lambda rng: db.get_keys(), False),
+        ("add_key", lambda rng: db.add_key(fresh("NEWKEY"), "normal", 5), False),
+        ("add_keys", lambda rng: db.add_keys([fresh("NEWKEY") for _ in range(100)], "normal", 5), False),
+        ("claim_key_in_db", lambda rng: db.claim_key_in_db(key(), user(rng)), True),
+        ("claim_keys_in_db", lambda rng: db.claim_keys_in_db([key() for _ in range(5)], user(rng)), True),
+        ("get_platforms", lambda rng: db.get_platforms(), False),
+        ("add_remove_platform", add_remove_platform, False),
+        ("get_stock_count", lambda rng: db.get_stock_count(platform()), False),
+        ("get_stock_for_platform", lambda rng: db.get_stock_for_platform(platform()), False),
+        ("add_stock_to_platform", lambda rng: db.add_stock_to_platform(platform(), [fresh("stock")]), False),
+        ("update_stock_for_platform", lambda rng: db.update_stock_for_platform(SCRATCH_PLATFORM, accounts(100)), False),
+        ("import_stock_lines", lambda rng: db.import_stock_lines(SCRATCH_PLATFORM, accounts(1000)), False),
+        ("pop_stock_item", lambda rng: db.pop_stock_item(platform()), True),
+        ("claim_stock_item", lambda rng: db.claim_stock_item(user(rng), platform(), 2), True),
+        ("get_channels", lambda rng: db.get_channels(), False),
+        ("add_channel", lambda rng: db.add_channel(fresh("https://t.me/bench")), False),
+        ("remove_channel", lambda rng: db.remove_channel(next(channel_ids)), False),
+        ("get_admins", lambda rng: db.get_admins(), False),
+        ("add_admin", lambda rng: db.add_admin(f"b{next(added_admins)}", "bench"), False),
+        ("ban_unban_admin", lambda rng: (db.ban_admin(f"a{rng.randrange(20)}"), db.unban_admin(f"a{rng.randrange(20)}")),
+         False),
+        ("remove_admin", lambda rng: db.remove_admin(f"b{next(removed_admins)}"), False),
+    ]
+
+def run(op, threads, duration, max_ops):
+    """
+    Runs op from `threads` threads for `duration` seconds (or max_ops calls in total).
+    Returns (ops_per_second, p50_us, p99_us).
+    """
+    timings = []
+    remaining = itertools.count()
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = []
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline and next(remaining) < max_ops:
+            started = time.perf_counter()
+            op(rng)
+            local.append(time.perf_counter() - started)
+        db.close_connection()
+        with lock:
+            timings.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    if not timings:
+        return 0.0, 0.0, 0.0
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6
+    return len(timings) / elapsed, p50, p99
+
+def summarize(samples):
+    """
+    Reduces run() results for one benchmark to (median_ops, best_ops, spread, p50_us, p99_us), where
+    spread is the gap between the slowest and fastest repeat as a fraction of the median and
+    the latencies are medians across repeats.
+    """
+    rates = sorted(ops for ops, _, _ in samples)
+    median = statistics.median(rates)
+    spread = (rates[-1] - rates[0]) / median if median else 0.0
+    return (median, rates[-1], spread,
+            statistics.median(p50 for _, p50, _ in samples), statistics.median(p99 for _, _, p99 in samples))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark db.py against seeded databases.")
+    parser.add_argument("--scales", default="10000,100000,1000000", help="comma-separated row counts")
+    parser.add_argument("--threads", type=int, default=4, help="threads for the concurrent run")
+    parser.add_argument("--duration", type=float, default=0.2, help="seconds per benchmark run")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per benchmark; the median is reported")
+    parser.add_argument("--only", default=None, help="comma-separated benchmark names to run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fail when every repeat's ops/s falls more than this fraction below the baseline")
+    args = parser.parse_args()
+
+    only = set(args.only.split(",")) if args.only else None
+    baseline = {}
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}, so there is nothing to compare against.\n"
+                  f"Record one on this machine with --save-baseline first.", file=sys.stderr)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    noisy = []
+    unbaselined = []
+    tmpdir = tempfile.mkdtemp(prefix="bot-dbbench-")
+    try:
+        for n in (int(s) for s in args.scales.split(",")):
+            started = time.perf_counter()
+            seed(os.path.join(tmpdir, f"bench-{n}.db"), n)
+            print(f"\n== {n:,} rows (seeded in {time.perf_counter() - started:.1f}s) ==")
+            cases = [(name, op, consumes, threads) for name, op, consumes in benchmarks(n)
+                     if not only or name in only for threads in (1, args.threads)]
+            samples = {(name, threads): [] for name, _, _, threads in cases}
+            # Round 0 is a short, discarded warm-up that fills the page cache and statement caches
+            for repeat in range(args.repeats + 1):
+                for name, op, consumes, threads in cases:
+                    # Split the cap over the rounds so they cannot use up the seeded rows either
+                    max_ops = n // 20 // (args.repeats + 1) if consumes else float("inf")
+                    result = run(op, threads, args.duration if repeat else min(args.duration, 0.1), max_ops)
+                    if repeat:
+                        samples[name, threads].append(result)
+
+            print(f"{'benchmark':<28} {'threads':>7} {'ops/s':>10} {'spread':>7} {'p50 us':>9} {'p99 us':>9} "
+                  f"{'baseline':>10}")
+            for (name, threads), runs in samples.items():
+                ops, best, spread, p50, p99 = summarize(runs)
+                key = f"{n}/{threads}/{name}"
+                results[key] = round(ops, 1)
+                base = baseline.get(key)
+                flag = ""
+                if not args.save_baseline and base is None:
+                    unbaselined.append(key)
+                    flag += "  NO BASELINE"
+                elif base and best < base * (1 - args.tolerance):
+                    regressions.append((key, base, ops, best))
+                    flag += "  REGRESSION"
+                if spread > args.tolerance:
+                    noisy.append((key, spread))
+                    flag += "  NOISY"
+                print(f"{name:<28} {threads:>7} {ops:>10.0f} {spread:>7.0%} {p50:>9.1f} {p99:>9.1f} "
+                      f"{base if base else '-':>10}{flag}")
+            db.close_connection()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if noisy:
+        print(f"\nWarning: {len(noisy)} benchmark(s) varied by more than {args.tolerance:.0%} between repeats; "
+              f"their numbers are not reliable (try more --repeats, a longer --duration or a quieter machine):")
+        for key, spread in noisy:
+            print(f"  {key}: {spread:.0%}")
+
+    if args.save_baseline:
+        baseline_data = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline_data = json.load(f)
+        baseline_data.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline_data, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if unbaselined:
+        print(f"\n{len(unbaselined)} benchmark(s) have no baseline entry and were not checked; "
+              f"re-record the baseline with --save-baseline:")
+        for key in unbaselined:
+            print(f"  {key}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} in every repeat:")
+        for key, base, ops, best in regressions:
+            print(f"  {key}: {ops:.0f} ops/s median ({best:.0f} best) vs baseline {base:.0f}")
+        return 1
+    return 2 if unbaselined else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# benchmarks/fake_bot_api.py
+# A local stand-in for api.telegram.org used by the load test. It serves the Bot API methods
+# the bot calls, hands out queued updates through getUpdates, and tells listeners about every
+# reply so the driver can time each step. Latency and 429 responses can be injected.
+import json
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+BOT_USER = {"id": 999000, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+# Methods a 429 may be injected into; getUpdates/getMe are never throttled
+THROTTLED_METHODS = {"sendMessage", "editMessageText", "editMessageReplyMarkup",
+                     "answerCallbackQuery", "sendDocument"}
+
+class FakeBotAPI:
+    """
+    Serves http://<listen>:<port>/bot<token>/<method>. Point apihelper.API_URL at api_url.
+    `latency` (seconds) is added to every call except getUpdates, with up to `jitter` extra.
+    A fraction `error_rate` of throttled calls is answered with 429 and `retry_after`.
+    `on_reply(chat_id, method, params)` is called for every reply the bot sends to a user.
+    """
+
+    def __init__(self, listen="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 retry_after=1, on_reply=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.on_reply = on_reply
+        self.updates = queue.Queue()
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._message_ids = iter(range(1, 1 << 62))
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((listen, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def api_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-bot-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def push_update(self, update):
+        self.updates.put(update)
+
+    def _next_message_id(self):
+        with self._lock:
+            return next(self._message_ids)
+
+    def _get_updates(self, params):
+        limit = int(params.get("limit") or 100)
+        timeout = min(float(params.get("timeout") or 0), 1.0)
+        result = []
+        try:
+            result.append(self.updates.get(timeout=timeout) if timeout else self.updates.get_nowait())
+            while len(result) < limit:
+                result.append(self.updates.get_nowait())
+        except queue.Empty:
+            pass
+        return result
+
+    def _message(self, chat_id, text=None):
+        return {"message_id": self._next_message_id(), "date": int(time.time()), "from": BOT_USER,
+                "chat": {"id": chat_id, "type": "private"}, "text": text or ""}
+
+    def handle(self, method, params):
+        """
+        Returns (http_status, response_dict) for one Bot API call.
+        """
+        with self._lock:
+            self.calls[method] += 1
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.random() * self.jitter)
+        if method in THROTTLED_METHODS and self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.throttled[method] += 1
+            return 429, {"ok": False, "error_code": 429,
+                         "description": f"Too Many Requests: retry after {self.retry_after}",
+                         "parameters": {"retry_after": self.retry_after}}
+
+        chat_id = params.get("chat_id")
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("deleteWebhook", "setWebhook", "setMyCommands"):
+            result = True
+        elif method == "getChat":
+            result = {"id": -1000000000000 - abs(hash(chat_id)) % 1000000, "type": "channel", "title": str(chat_id)}
+        elif method == "getChatMember":
+            user_id = int(params["user_id"])
+            user = BOT_USER if user_id == BOT_USER["id"] else {"id": user_id, "is_bot": False, "first_name": "u"}
+            status = "creator" if user_id == BOT_USER["id"] else "member"
+            result = {"status": status, "user": user, "is_anonymous": False}
+        elif method in ("sendMessage", "sendDocument"):
+            result = self._message(int(chat_id), params.get("text") or params.get("caption"))
+        elif method in ("editMessageText", "editMessageReplyMarkup"):
+            result = self._message(int(chat_id), params.get("text")) if chat_id else True
+        elif method == "answerCallbackQuery":
+            result = True
+        else:
+            return 404, {"ok": False, "error_code": 404, "description": f"Not Found: method {method}"}
+
+        if self.on_reply is not None and method in THROTTLED_METHODS:
+            # Callback answers carry the user in the query id (see load_test.callback_update)
+            target = params.get("callback_query_id", "").split(":")[0] if method == "answerCallbackQuery" else chat_id
+            if target:
+                self.on_reply(int(target), method, params)
+        return 200, {"ok": True, "result": result}
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; without this, keep-alive replies stall on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                url = urlsplit(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update(_parse_body(self.headers.get("Content-Type", ""), self.rfile.read(length)))
+                status, response = api.handle(method, params)
+                body = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def _parse_body(content_type, body):
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return dict(parse_qsl(body.decode("utf-8")))
+    if content_type.startswith("application/json"):
+        return {k: v if isinstance(v, str) else json.dumps(v) for k, v in json.loads(body).items()}
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name and part.get_filename() is None:
+                params[name] = part.get_content()
+        return params
+    return {}
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the fake Bot API on its own.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    api = FakeBotAPI(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"Fake Bot API at {api.api_url}")
+    api.httpd.serve_forever()
@@ -0,0 +1,232 @@
+# benchmarks/load_test.py
+# End-to-end load test: runs main.py's bot against the fake Bot API in fake_bot_api.py and
+# drives synthetic users through /start -> verify -> rewards -> platform -> claim -> /redeem.
+# Everything runs locally against a temporary database; nothing touches api.telegram.org.
+#
+#   python benchmarks/load_test.py --users 2000 --concurrency 200 --workers 8
+#   python benchmarks/load_test.py --latency 0.05 --error-rate 0.01
+import argparse
+import itertools
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_bot_api import FakeBotAPI, BOT_USER
+
+FIRST_USER_ID = 10_000_000
+PLATFORMS = 5
+REPLY_TIMEOUT = 10  # default seconds a step may take before it counts as failed
+
+_update_ids = itertools.count(1)
+
+def text_update(user_id, text):
+    from webhook import make_text_update
+    return make_text_update(next(_update_ids), user_id, text, username=f"user{user_id}")
+
+def callback_update(user_id, data):
+    """
+    A callback query from user_id. The query id starts with the user id so the fake API can
+    route answerCallbackQuery back to the right user.
+    """
+    update_id = next(_update_ids)
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": f"{user_id}:{update_id}",
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {"message_id": update_id, "date": 0, "from": BOT_USER,
+                        "chat": {"id": user_id, "type": "private"}, "text": "menu"},
+        },
+    }
+
+def build_flow(user_id, platform, key):
+    """
+    The steps of one user's session: (name, update, replies the bot sends for it).
+    """
+    return [
+        ("start", text_update(user_id, "/start"), 2),           # verified text + main menu
+        ("verify", callback_update(user_id, "verify"), 2),      # callback answer + main menu
+        ("rewards", callback_update(user_id, "menu_rewards"), 1),
+        ("platform", callback_update(user_id, f"reward_{platform}"), 1),
+        ("claim", callback_update(user_id, f"claim_{platform}"), 2),  # callback answer + account
+        ("redeem", text_update(user_id, f"/redeem {key}"), 1),
+    ]
+
+class Driver:
+    """
+    Feeds each user's steps to the fake API one at a time and times how long the bot takes
+    to send all the replies a step expects.
+    """
+
+    def __init__(self, api, reply_timeout=REPLY_TIMEOUT):
+        self.api = api
+        self.reply_timeout = reply_timeout
+        self.inboxes = {}
+        self.latencies = {}
+        self.failures = {}
+        self.updates = 0
+        self._lock = threading.Lock()
+        api.on_reply = self.on_reply
+
+    def on_reply(self, user_id, method, params):
+        inbox = self.inboxes.get(user_id)
+        if inbox is not None:
+            inbox.put(method)
+
+    def run_user(self, user_id, platform, key):
+        inbox = self.inboxes[user_id] = queue.Queue()
+        try:
+            for name, update, replies in build_flow(user_id, platform, key):
+                started = time.perf_counter()
+                self.api.push_update(update)
+                try:
+                    for _ in range(replies):
+                        inbox.get(timeout=self.reply_timeout)
+                except queue.Empty:
+                    self._record(name, None)
+                    return False
+                self._record(name, time.perf_counter() - started)
+            return True
+        finally:
+            del self.inboxes[user_id]
+
+    def _record(self, name, seconds):
+        with self._lock:
+            self.updates += 1
+            if seconds is None:
+                self.failures[name] = self.failures.get(name, 0) + 1
+            else:
+                self.latencies.setdefault(name, []).append(seconds)
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def seed(users, keys_points=5):
+    """
+    Creates the platforms, enough stock for one claim per user and one key per user.
+    """
+    import db
+    db.init_db()
+    platforms = [f"Bench{i}" for i in range(PLATFORMS)]
+    for platform in platforms:
+        db.add_platform(platform)
+        db.import_stock_lines(platform, (f"{platform}-account-{i}" for i in range(users)))
+    keys = [f"BENCH-{i:08d}" for i in range(users)]
+    db.add_keys(keys, "normal", keys_points)
+    return platforms, keys
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against a fake Bot API.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="users active at the same time")
+    parser.add_argument("--workers", type=int, default=8, help="bot handler threads (BOT_WORKERS)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each Bot API call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of replies answered with 429")
+    parser.add_argument("--reply-timeout", type=float, default=REPLY_TIMEOUT, help="seconds before a step counts as failed")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bot-loadtest-")
+    import config
+    config.TOKEN = "123456:LOADTEST"
+    config.DATABASE = os.path.join(tmpdir, "bot.db")
+    config.REQUIRED_CHANNELS = ["https://t.me/bench_channel"]
+    config.OWNERS = []
+    config.ADMINS = []
+    config.RUN_MODE = "polling"
+    config.BOT_WORKERS = args.workers
+    # Every synthetic user is new, so the per-user limiter never trips; keep it out of the way anyway
+    config.RATE_LIMIT_BURST = 100
+
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    from telebot import apihelper
+    apihelper.API_URL = api.api_url
+
+    platforms, keys = seed(args.users)
+
+    # Importing main creates the bot, initializes the database and calls getMe on the fake API
+    import main as bot_main
+    from metrics import metrics
+    metrics.clear()
+    poller = threading.Thread(target=bot_main.bot.polling,
+                              kwargs={"non_stop": True, "interval": 0, "timeout": 5, "long_polling_timeout": 1},
+                              daemon=True)
+    poller.start()
+
+    driver = Driver(api, args.reply_timeout)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda i: driver.run_user(FIRST_USER_ID + i, platforms[i % len(platforms)], keys[i]),
+                                range(args.users)))
+    elapsed = time.perf_counter() - started
+    bot_main.bot.stop_polling()
+    api.stop()
+
+    snapshot = metrics.snapshot()
+    lock = snapshot.get(("db_lock", "begin_immediate"))
+    report = {
+        "users": args.users,
+        "completed_flows": sum(results),
+        "elapsed_s": round(elapsed, 3),
+        "updates": driver.updates,
+        "updates_per_s": round(driver.updates / elapsed, 1),
+        "steps": {
+            name: {
+                "count": len(values),
+                "failed": driver.failures.get(name, 0),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            }
+            for name, values in driver.latencies.items()
+        },
+        "api_calls": dict(api.calls),
+        "api_429s": dict(api.throttled),
+        "sqlite_write_lock": {
+            "acquisitions": lock.count if lock else 0,
+            "p50_ms": round(lock.quantile(0.50) * 1000, 3) if lock else 0,
+            "p95_ms": round(lock.quantile(0.95) * 1000, 3) if lock else 0,
+            "p99_ms": round(lock.quantile(0.99) * 1000, 3) if lock else 0,
+            "wait_total_ms": round(lock.total * 1000, 1) if lock else 0,
+        },
+        "db_errors": {name: series.errors for (kind, name), series in snapshot.items()
+                      if kind == "db" and series.errors},
+        "database": config.DATABASE,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['completed_flows']}/{args.users} flows in {report['elapsed_s']}s, "
+          f"{report['updates_per_s']} updates/s ({args.workers} workers, {args.concurrency} concurrent users)")
+    print(f"{'step':<10} {'count':>7} {'failed':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, _, _ in build_flow(0, "", ""):
+        step = report["steps"].get(name)
+        if step:
+            print(f"{name:<10} {step['count']:>7} {step['failed']:>7} {step['p50_ms']:>9} {step['p95_ms']:>9} {step['p99_ms']:>9}")
+    print(f"Bot API calls: {report['api_calls']}")
+    if report["api_429s"]:
+        print(f"Injected 429s: {report['api_429s']}")
+    lock = report["sqlite_write_lock"]
+    print(f"SQLite write lock: {lock['acquisitions']} acquisitions, wait p50 {lock['p50_ms']} ms, "
+          f"p95 {lock['p95_ms']} ms, p99 {lock['p99_ms']} ms, total {lock['wait_total_ms']} ms")
+    if report["db_errors"]:
+        print(f"DB errors: {report['db_errors']}")
+
+if __name__ == '__main__':
+    main()
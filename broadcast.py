@@ -0,0 +1,116 @@
+# broadcast.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+import db
+from outbox import outbox, call_bot, get_retry_after
+from ratelimit import TokenBucket
+
+BROADCAST_RATE = getattr(config, "BROADCAST_RATE", 25)
+BROADCAST_CONCURRENCY = getattr(config, "BROADCAST_CONCURRENCY", 8)
+BROADCAST_PAGE_SIZE = getattr(config, "BROADCAST_PAGE_SIZE", 200)
+BROADCAST_PROGRESS_INTERVAL = 5  # seconds between progress message edits
+BROADCAST_MAX_RETRIES = 3
+
+SENT, FAILED, BLOCKED = "sent", "failed", "blocked"
+
+BROADCAST_STARTING_TEXT = "📣 Starting broadcast..."
+BROADCAST_PROGRESS_TEXT = ("📣 <b>Broadcast #{id}</b> {state}\n"
+                           "• Progress: {done}/{total}\n"
+                           "• Delivered: {sent} • Failed: {failed} • Blocked: {blocked}\n"
+                           "• Speed: {rate:.1f} msg/s • ETA: {eta}")
+
+def start_broadcast(bot, admin_id, text, status_message, loop=None):
+    """
+    Creates a broadcast of `text` to every non-banned, non-blocked user and sends it in the
+    background. `status_message` is edited with live progress. Pass the event loop when `bot`
+    is an AsyncTeleBot. Returns the broadcast ID.
+    """
+    total = db.count_broadcast_recipients()
+    broadcast_id = db.create_broadcast(admin_id, text, status_message.chat.id, status_message.message_id, total)
+    _spawn(bot, broadcast_id, loop)
+    return broadcast_id
+
+def resume_broadcasts(bot, loop=None):
+    """
+    Restarts broadcasts that were still running when the process stopped, from their saved cursor.
+    """
+    for broadcast_id in db.get_running_broadcasts():
+        _spawn(bot, broadcast_id, loop)
+
+def _spawn(bot, broadcast_id, loop):
+    threading.Thread(target=_run, args=(bot, broadcast_id, loop), name=f"broadcast-{broadcast_id}", daemon=True).start()
+
+def _send_one(bot, loop, bucket, user_id, text):
+    """
+    `bucket` caps this broadcast at BROADCAST_RATE; every send also takes a token from the
+    outbox's global bucket, so broadcasts and outbox sends together stay under the global limit.
+    """
+    for _ in range(BROADCAST_MAX_RETRIES):
+        bucket.acquire()
+        outbox.global_bucket.acquire()
+        try:
+            call_bot(loop, bot.send_message, user_id, text, parse_mode="HTML")
+            return SENT
+        except Exception as e:
+            if getattr(e, "error_code", None) == 403:
+                # Blocked by the user or account deleted
+                return BLOCKED
+            retry_after = get_retry_after(e)
+            if retry_after is None:
+                return FAILED
+            bucket.pause(retry_after)
+            outbox.global_bucket.pause(retry_after)
+    return FAILED
+
+def _format_eta(seconds):
+    if seconds is None:
+        return "—"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def _run(bot, broadcast_id, loop):
+    """
+    Sends one broadcast page by page. Progress is saved after every page, so a restart
+    re-sends at most the page that was in flight.
+    """
+    _, _, text, chat_id, message_id, _, cursor, total, sent, failed, blocked = db.get_broadcast(broadcast_id)
+    bucket = TokenBucket(BROADCAST_RATE)
+    started = time.monotonic()
+    done_at_start = sent + failed + blocked
+    last_report = 0
+
+    def report(state):
+        done = sent + failed + blocked
+        elapsed = time.monotonic() - started
+        rate = (done - done_at_start) / elapsed if elapsed else 0
+        eta = (max(total - done, 0) / rate) if rate and state == "running" else None
+        try:
+            call_bot(loop, bot.edit_message_text,
+                     BROADCAST_PROGRESS_TEXT.format(id=broadcast_id, state="✅ done" if state == "done" else "⏳ running",
+                                                    done=done, total=total, sent=sent, failed=failed,
+                                                    blocked=blocked, rate=rate, eta=_format_eta(eta)),
+                     chat_id=chat_id, message_id=message_id, parse_mode="HTML")
+        except Exception as e:
+            print(f"Error updating broadcast progress: {e}")
+
+    with ThreadPoolExecutor(max_workers=BROADCAST_CONCURRENCY, thread_name_prefix=f"broadcast-{broadcast_id}") as pool:
+        while True:
+            page = db.get_broadcast_recipients(cursor, BROADCAST_PAGE_SIZE)
+            if not page:
+                break
+            results = list(pool.map(lambda user_id: _send_one(bot, loop, bucket, user_id, text), page))
+            db.mark_users_blocked([user_id for user_id, result in zip(page, results) if result == BLOCKED])
+            sent += results.count(SENT)
+            failed += results.count(FAILED)
+            blocked += results.count(BLOCKED)
+            cursor = page[-1]
+            db.save_broadcast_progress(broadcast_id, cursor, sent, failed, blocked)
+            if time.monotonic() - last_report >= BROADCAST_PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                report("running")
+
+    db.save_broadcast_progress(broadcast_id, cursor, sent, failed, blocked, status="done")
+    report("done")
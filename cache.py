@@ -0,0 +1,54 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded cache whose entries expire `ttl` seconds after they are set.
+    When full, the least recently used entry is evicted. A ttl of None never expires entries.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
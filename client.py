@@ -0,0 +1,81 @@
+# client.py
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import telebot
+from telebot import apihelper
+import config
+from metrics import metrics
+
+HTTP_POOL_SIZE = getattr(config, "HTTP_POOL_SIZE", 32)
+HTTP_CONNECT_TIMEOUT = getattr(config, "HTTP_CONNECT_TIMEOUT", 5)
+HTTP_READ_TIMEOUT = getattr(config, "HTTP_READ_TIMEOUT", 30)
+BOT_WORKERS = getattr(config, "BOT_WORKERS", 2)
+
+def _create_session():
+    """
+    One keep-alive session with a connection pool large enough for every worker thread.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Shared by every Bot API call and file download in the threaded runtime
+session = _create_session()
+
+def _send_request(method, url, **kwargs):
+    """
+    apihelper's request sender: sends through `session` and records the call under its API method.
+    """
+    started = time.perf_counter()
+    error = True
+    try:
+        response = session.request(method, url, **kwargs)
+        error = response.status_code >= 400
+        return response
+    finally:
+        metrics.observe("bot_api", url.rsplit("/", 1)[-1], time.perf_counter() - started, error)
+
+def _instrument_async_requests(asyncio_helper):
+    process_request = asyncio_helper._process_request
+    if getattr(process_request, "instrumented", False):
+        return
+
+    async def timed_process_request(token, url, *args, **kwargs):
+        started = time.perf_counter()
+        error = True
+        try:
+            result = await process_request(token, url, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            metrics.observe("bot_api", url, time.perf_counter() - started, error)
+
+    timed_process_request.instrumented = True
+    asyncio_helper._process_request = timed_process_request
+
+def create_bot(**kwargs):
+    """
+    Creates the bot for the threaded runtime. All Bot API requests go through `session`,
+    so connections are reused instead of opening a new TLS connection per call, and are timed.
+    """
+    apihelper.session = session
+    apihelper.SESSION_TIME_TO_LIVE = None
+    apihelper.CUSTOM_REQUEST_SENDER = _send_request
+    apihelper.CONNECT_TIMEOUT = HTTP_CONNECT_TIMEOUT
+    apihelper.READ_TIMEOUT = HTTP_READ_TIMEOUT
+    kwargs.setdefault("num_threads", BOT_WORKERS)
+    return telebot.TeleBot(config.TOKEN, parse_mode="HTML", **kwargs)
+
+def create_async_bot(**kwargs):
+    """
+    Creates the AsyncTeleBot for async_main.py, sharing one pooled aiohttp session.
+    """
+    from telebot import asyncio_helper
+    from telebot.async_telebot import AsyncTeleBot
+    asyncio_helper.REQUEST_LIMIT = HTTP_POOL_SIZE
+    asyncio_helper.REQUEST_TIMEOUT = HTTP_READ_TIMEOUT
+    _instrument_async_requests(asyncio_helper)
+    return AsyncTeleBot(config.TOKEN, parse_mode="HTML", **kwargs)
@@ -10,3 +10,72 @@ REQUIRED_CHANNELS = [
     "https://t.me/ShadowsquadHits",
     "https://t.me/Binhub_Originlabs"
 ]
+
+# SQLite database file and connection tuning (see db.get_connection)
+DATABASE = "bot.db"
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KB = 16384
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_STATEMENT_CACHE_SIZE = 256
+
+# Cached user rows (entries / seconds)
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 300
+
+# Channel verification caching (seconds / entries)
+MEMBERSHIP_CACHE_TTL = 600
+MEMBERSHIP_CACHE_SIZE = 100000
+BOT_ADMIN_CACHE_TTL = 600
+MEMBERSHIP_CHECK_TIMEOUT = 5
+MEMBERSHIP_CHECK_WORKERS = 16
+
+# Update delivery: "polling" for development, "webhook" for production
+RUN_MODE = "polling"
+WEBHOOK_URL = None  # public HTTPS URL Telegram should POST to, e.g. "https://bot.example.com/webhook"
+WEBHOOK_LISTEN = "127.0.0.1"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_SECRET = None  # sent back by Telegram in X-Telegram-Bot-Api-Secret-Token; random per run if unset
+WEBHOOK_WORKERS = 8
+WEBHOOK_QUEUE_SIZE = 1000
+
+# Async runtime (async_main.py): threads that run SQLite work off the event loop
+DB_EXECUTOR_WORKERS = 4
+
+# Outbound message queue (outbox.py): Telegram allows ~30 msg/s overall and ~1 msg/s per chat
+OUTBOX_GLOBAL_RATE = 30
+OUTBOX_CHAT_RATE = 1
+OUTBOX_WORKERS = 4
+OUTBOX_MAX_RETRIES = 3
+
+# Shared HTTP client for the Bot API (client.py)
+HTTP_POOL_SIZE = 32
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+
+# Handler threads for polling mode (webhook mode uses WEBHOOK_WORKERS)
+BOT_WORKERS = 2
+
+# Broadcasts (broadcast.py): share the outbox's OUTBOX_GLOBAL_RATE budget, capped below it to leave room for replies
+BROADCAST_RATE = 25
+BROADCAST_CONCURRENCY = 8
+BROADCAST_PAGE_SIZE = 200
+
+# Largest batch /gen accepts
+GEN_MAX_KEYS = 100000
+
+# /redeem brute-force throttle: failed keys allowed per user within the window (seconds)
+REDEEM_FAIL_LIMIT = 5
+REDEEM_FAIL_WINDOW = 600
+
+# Platforms per page in the rewards menu
+REWARDS_PAGE_SIZE = 10
+
+# Per-user rate limit (middleware.py): requests per second and burst, per command or callback
+RATE_LIMIT_RATE = 1
+RATE_LIMIT_BURST = 3
+RATE_LIMIT_IDLE = 300  # seconds before an idle user's buckets are dropped
+
+# Prometheus metrics endpoint (metrics.py); None disables it. /stats shows the same numbers to admins.
+METRICS_LISTEN = "127.0.0.1"
+METRICS_PORT = 9464
@@ -1,16 +1,166 @@
 # db.py
 import sqlite3
 import json
+import random
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+import config
+from cache import TTLCache
+from metrics import metrics, instrument_module
 
-DATABASE = "bot.db"
+DATABASE = getattr(config, "DATABASE", "bot.db")
 
+# Connection tuning, overridable from config.py
+BUSY_TIMEOUT_MS = getattr(config, "DB_BUSY_TIMEOUT_MS", 5000)
+CACHE_SIZE_KB = getattr(config, "DB_CACHE_SIZE_KB", 16384)
+MMAP_SIZE = getattr(config, "DB_MMAP_SIZE", 256 * 1024 * 1024)
+STATEMENT_CACHE_SIZE = getattr(config, "DB_STATEMENT_CACHE_SIZE", 256)
+
+# In-process cache of user rows (see get_user)
+USER_CACHE_SIZE = getattr(config, "USER_CACHE_SIZE", 10000)
+USER_CACHE_TTL = getattr(config, "USER_CACHE_TTL", 300)
+
+_local = threading.local()
+
+###############################
+# CONNECTION LAYER
+###############################
+def get_connection():
+    """
+    Returns the calling thread's long-lived connection, opening it on first use.
+    Connections run in autocommit mode (use transaction() to group statements),
+    with WAL journaling and the tuned PRAGMAs below. Compiled statements are kept
+    in the per-connection statement cache, so repeated queries are not re-prepared.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE,
+                               timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size={int(MMAP_SIZE)}")
+        conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_MS)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+def close_connection():
+    """
+    Closes the calling thread's connection, if it has one.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.depth = 0
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Runs the enclosed statements in a single transaction on the thread's connection.
+    BEGIN IMMEDIATE takes the write lock up front, which read-then-write paths need.
+    Nested blocks join the outermost transaction.
+    """
+    conn = get_connection()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+    if immediate:
+        # Time spent waiting for the write lock shows up as db_lock/begin_immediate in metrics
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        metrics.observe("db_lock", "begin_immediate", time.perf_counter() - started)
+    else:
+        conn.execute("BEGIN")
+    _local.depth = 1
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        try:
+            conn.execute("COMMIT")
+        except BaseException:
+            # A failed COMMIT (e.g. SQLITE_BUSY) leaves the transaction open on this long-lived connection
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            raise
+    finally:
+        _local.depth = 0
+
+def execute(sql, params=()):
+    """
+    Executes a single statement on the thread's connection and returns the cursor.
+    """
+    return get_connection().execute(sql, params)
+
+def fetchone(sql, params=()):
+    return get_connection().execute(sql, params).fetchone()
+
+def fetchall(sql, params=()):
+    return get_connection().execute(sql, params).fetchall()
+
+###############################
+# SCHEMA
+###############################
 def init_db():
     """
-    Initialize the database with all necessary tables.
+    Brings the database schema up to date (see migrate()) and checks the hot query plans.
+    """
+    migrate()
+    # Fail at startup rather than let a query that lost its index slow down under load
+    scans = check_query_plans()
+    if scans:
+        raise RuntimeError("Full table scan in hot queries:\n" +
+                           "\n".join(f"  {detail}: {sql}" for sql, detail in scans))
+
+def migrate():
+    """
+    Applies the migrations in MIGRATIONS that the database has not seen yet and returns the
+    schema version. The version lives in PRAGMA user_version, so a current database costs one
+    PRAGMA read and no DDL. Each migration runs in its own transaction together with the
+    version bump; chunked migrations commit after every chunk and pick up where they stopped.
+    """
+    version = fetchone("PRAGMA user_version")[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        pending = True
+        while pending:
+            with transaction(immediate=True) as c:
+                # Another process may have migrated while we waited for the write lock
+                if c.execute("PRAGMA user_version").fetchone()[0] >= number:
+                    break
+                pending = bool(migration(c)) and getattr(migration, "chunked", False)
+                if not pending:
+                    c.execute(f"PRAGMA user_version={number}")
+        else:
+            print(f"Applied migration {number}: {migration.__name__.lstrip('_')}")
+    return max(version, len(MIGRATIONS))
+
+def chunked(migration):
+    """
+    Marks a data migration that runs in chunks: migration(c) does one chunk and returns True
+    while work remains. Its progress must be readable from the data, so a chunk interrupted
+    by a restart is simply redone.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
+    migration.chunked = True
+    return migration
+
+# Migrations 1-6 also run over databases created before versioning (user_version 0), so
+# they only create what is missing. Append new migrations; never edit or reorder old ones.
+def _create_tables(c):
     # Users table: stores Telegram ID, username, join date, points, referrals, banned flag, pending_referrer
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -23,7 +173,7 @@ def init_db():
             pending_referrer TEXT
         )
     ''')
-    
+
     # Referrals table
     c.execute('''
         CREATE TABLE IF NOT EXISTS referrals (
@@ -32,8 +182,8 @@ def init_db():
             PRIMARY KEY (user_id, referred_id)
         )
     ''')
-    
-    # Platforms table: platform name and JSON-encoded stock
+
+    # Platforms table: platform name and legacy JSON-encoded stock (migrated to stock_items)
     c.execute('''
         CREATE TABLE IF NOT EXISTS platforms (
             platform_name TEXT PRIMARY KEY,
@@ -41,6 +191,28 @@ def init_db():
         )
     ''')
 
+    # Stock items table: one row per account, claimed by deleting the row
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stock_items (
+            id INTEGER PRIMARY KEY,
+            platform_name TEXT NOT NULL,
+            account TEXT NOT NULL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stock_items_platform ON stock_items (platform_name)")
+
+    # Claims table: history of accounts handed out and what they cost
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS claims (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            platform_name TEXT,
+            account TEXT,
+            cost INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
     # Reviews table
     c.execute('''
         CREATE TABLE IF NOT EXISTS reviews (
@@ -91,177 +263,704 @@ def init_db():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+    # Broadcasts table: message sent to every user, with a keyset cursor so restarts resume
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id TEXT,
+            text TEXT,
+            chat_id TEXT,
+            message_id INTEGER,
+            status TEXT DEFAULT 'running',
+            cursor TEXT DEFAULT '',
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            blocked INTEGER DEFAULT 0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _unique_stock_accounts(c):
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_stock_items_account'").fetchone():
+        # Drop duplicates stocked before accounts were unique per platform
+        c.execute("DELETE FROM stock_items WHERE id NOT IN "
+                  "(SELECT MIN(id) FROM stock_items GROUP BY platform_name, account)")
+        c.execute("CREATE UNIQUE INDEX idx_stock_items_account ON stock_items (platform_name, account)")
+
+def _add_keys_claimed_at(c):
+    # keys.claimed_at: when the key was redeemed
+    if "claimed_at" not in [row[1] for row in c.execute("PRAGMA table_info(keys)")]:
+        c.execute("ALTER TABLE keys ADD COLUMN claimed_at DATETIME")
+
+def _add_users_blocked(c):
+    # users.blocked: set when Telegram reports the user blocked the bot
+    if "blocked" not in [row[1] for row in c.execute("PRAGMA table_info(users)")]:
+        c.execute("ALTER TABLE users ADD COLUMN blocked INTEGER DEFAULT 0")
+
+def _add_secondary_indexes(c):
+    # Secondary indexes for the lookups that are not on a primary key
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_referrals_referred'").fetchone():
+        # A user can only be referred once; keep the first referral recorded for each
+        c.execute("DELETE FROM referrals WHERE rowid NOT IN (SELECT MIN(rowid) FROM referrals GROUP BY referred_id)")
+        c.execute("CREATE UNIQUE INDEX idx_referrals_referred ON referrals (referred_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_recipients ON users (banned, blocked, telegram_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_keys_claimed_by ON keys (claimed_by)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews (user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_admin_logs_admin ON admin_logs (admin_id, timestamp)")
+
+@chunked
+def _migrate_json_stock(c):
+    """
+    Moves the JSON-encoded stock of one platform from platforms.stock into stock_items and
+    clears the column, so every chunk commits one platform and a restart skips finished ones.
+    """
+    row = c.execute("SELECT platform_name, stock FROM platforms WHERE stock IS NOT NULL LIMIT 1").fetchone()
+    if row is None:
+        return False
+    platform_name, stock = row
+    try:
+        accounts = json.loads(stock) if stock else []
+    except Exception:
+        accounts = []
+    c.executemany("INSERT OR IGNORE INTO stock_items (platform_name, account) VALUES (?, ?)",
+                  ((platform_name, str(account)) for account in accounts))
+    c.execute("UPDATE platforms SET stock=NULL WHERE platform_name=?", (platform_name,))
+    return True
+
+# Schema version N is reached by applying MIGRATIONS[N - 1]
+MIGRATIONS = (
+    _create_tables,
+    _unique_stock_accounts,
+    _add_keys_claimed_at,
+    _add_users_blocked,
+    _add_secondary_indexes,
+    _migrate_json_stock,
+)
+
+###############################
+# USERS
+###############################
+# One users row; also indexable by position, in table column order
+User = namedtuple("User", "telegram_id username join_date points referrals banned pending_referrer blocked")
+USER_COLUMNS = ", ".join(User._fields)
+
+# Recently read users by telegram_id. Every write below invalidates the rows it touches after
+# committing; _user_generation stops a read that raced with a write from caching the old row.
+_user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+
+GET_USER_SQL = f"SELECT {USER_COLUMNS} FROM users WHERE telegram_id=?"
+USER_EXISTS_SQL = "SELECT 1 FROM users WHERE telegram_id=?"
+USER_POINTS_SQL = "SELECT points FROM users WHERE telegram_id=?"
+SET_USER_POINTS_SQL = "UPDATE users SET points=? WHERE telegram_id=?"
+ADD_USER_POINTS_SQL = "UPDATE users SET points = points + ? WHERE telegram_id=?"
+DEBIT_USER_POINTS_SQL = "UPDATE users SET points = points - ? WHERE telegram_id=? AND points >= ?"
+SET_PENDING_REFERRER_SQL = "UPDATE users SET pending_referrer=? WHERE telegram_id=?"
+SET_USER_BANNED_SQL = "UPDATE users SET banned=? WHERE telegram_id=?"
+SET_USER_BLOCKED_SQL = "UPDATE users SET blocked=? WHERE telegram_id=?"
+_user_generation = 0
+
+def _invalidate_users(*telegram_ids):
+    global _user_generation
+    with _user_cache_lock:
+        _user_generation += 1
+        for telegram_id in telegram_ids:
+            _user_cache.pop(str(telegram_id))
 
 def add_user(telegram_id, username, join_date, pending_referrer=None):
     """
     Adds a new user to the database if they do not already exist.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO users (telegram_id, username, join_date, pending_referrer) VALUES (?, ?, ?, ?)",
-              (telegram_id, username, join_date, pending_referrer))
-    conn.commit()
-    conn.close()
+    execute("INSERT OR IGNORE INTO users (telegram_id, username, join_date, pending_referrer) VALUES (?, ?, ?, ?)",
+            (telegram_id, username, join_date, pending_referrer))
+    _invalidate_users(telegram_id)
 
 def get_user(telegram_id):
     """
-    Retrieves a user from the database by their telegram_id.
+    Retrieves a user by their telegram_id as a User, or None. Served from the user cache when possible.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE telegram_id=?", (telegram_id,))
-    user = c.fetchone()
-    conn.close()
+    telegram_id = str(telegram_id)
+    user = _user_cache.get(telegram_id)
+    if user is None:
+        generation = _user_generation
+        row = fetchone(GET_USER_SQL, (telegram_id,))
+        if row is None:
+            return None
+        user = User._make(row)
+        with _user_cache_lock:
+            if generation == _user_generation:
+                _user_cache.set(telegram_id, user)
     return user
 
+def clear_user_cache():
+    global _user_generation
+    with _user_cache_lock:
+        _user_generation += 1
+        _user_cache.clear()
+
+def get_users():
+    """
+    Retrieves (telegram_id, username, banned) for every user.
+    """
+    return fetchall("SELECT telegram_id, username, banned FROM users")
+
 def update_user_pending_referral(telegram_id, pending_referrer):
     """
     Updates the pending referral for a user.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("UPDATE users SET pending_referrer=? WHERE telegram_id=?", (pending_referrer, telegram_id))
-    conn.commit()
-    conn.close()
+    execute(SET_PENDING_REFERRER_SQL, (pending_referrer, telegram_id))
+    _invalidate_users(telegram_id)
 
 def clear_pending_referral(telegram_id):
     """
     Clears the pending referral for a user.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("UPDATE users SET pending_referrer=NULL WHERE telegram_id=?", (telegram_id,))
-    conn.commit()
-    conn.close()
+    execute(SET_PENDING_REFERRER_SQL, (None, telegram_id))
+    _invalidate_users(telegram_id)
+
+def update_user_points(telegram_id, points):
+    """
+    Updates the points for a specific user.
+    """
+    execute(SET_USER_POINTS_SQL, (points, telegram_id))
+    _invalidate_users(telegram_id)
+
+def ban_user(user_id):
+    execute(SET_USER_BANNED_SQL, (1, str(user_id)))
+    _invalidate_users(user_id)
+
+def unban_user(user_id):
+    execute(SET_USER_BANNED_SQL, (0, str(user_id)))
+    _invalidate_users(user_id)
+
+def mark_users_blocked(user_ids):
+    user_ids = [str(uid) for uid in user_ids]
+    get_connection().executemany(SET_USER_BLOCKED_SQL, ((1, uid) for uid in user_ids))
+    _invalidate_users(*user_ids)
+
+def unblock_user(user_id):
+    execute(SET_USER_BLOCKED_SQL, (0, str(user_id)))
+    _invalidate_users(user_id)
+
+###############################
+# BROADCASTS
+###############################
+BROADCAST_COLUMNS = "id, admin_id, text, chat_id, message_id, status, cursor, total, sent, failed, blocked"
+
+COUNT_RECIPIENTS_SQL = "SELECT COUNT(*) FROM users WHERE banned=0 AND blocked=0"
+RECIPIENTS_PAGE_SQL = ("SELECT telegram_id FROM users WHERE telegram_id > ? AND banned=0 AND blocked=0 "
+                       "ORDER BY telegram_id LIMIT ?")
+GET_BROADCAST_SQL = f"SELECT {BROADCAST_COLUMNS} FROM broadcasts WHERE id=?"
+SAVE_BROADCAST_PROGRESS_SQL = "UPDATE broadcasts SET cursor=?, sent=?, failed=?, blocked=?, status=? WHERE id=?"
+
+def count_broadcast_recipients():
+    return fetchone(COUNT_RECIPIENTS_SQL)[0]
+
+def get_broadcast_recipients(after_id, limit):
+    """
+    Returns the next `limit` recipient IDs after `after_id`, walking the users primary key
+    (keyset pagination), so each page costs the same no matter how far the broadcast has got.
+    """
+    return [row[0] for row in fetchall(RECIPIENTS_PAGE_SQL, (after_id, limit))]
+
+def create_broadcast(admin_id, text, chat_id, message_id, total):
+    return execute("INSERT INTO broadcasts (admin_id, text, chat_id, message_id, total) VALUES (?, ?, ?, ?, ?)",
+                   (str(admin_id), text, str(chat_id), message_id, total)).lastrowid
+
+def get_broadcast(broadcast_id):
+    """
+    Returns the broadcast row with the columns in BROADCAST_COLUMNS order.
+    """
+    return fetchone(GET_BROADCAST_SQL, (broadcast_id,))
+
+def get_running_broadcasts():
+    return [row[0] for row in fetchall("SELECT id FROM broadcasts WHERE status='running'")]
+
+def save_broadcast_progress(broadcast_id, cursor, sent, failed, blocked, status="running"):
+    execute(SAVE_BROADCAST_PROGRESS_SQL, (cursor, sent, failed, blocked, status, broadcast_id))
+
+###############################
+# REFERRALS, REVIEWS AND LOGS
+###############################
+INSERT_REFERRAL_SQL = "INSERT OR IGNORE INTO referrals (user_id, referred_id) VALUES (?, ?)"
+CREDIT_REFERRER_SQL = "UPDATE users SET points = points + 4, referrals = referrals + 1 WHERE telegram_id=?"
 
 def add_referral(referrer_id, referred_id):
     """
     Adds a referral entry in the database and updates points for the referrer.
+    referred_id is unique, so a user who was already referred is ignored.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT * FROM referrals WHERE referred_id=?", (referred_id,))
-    if c.fetchone():
-        conn.close()
-        return
-    c.execute("INSERT INTO referrals (user_id, referred_id) VALUES (?, ?)", (referrer_id, referred_id))
-    c.execute("UPDATE users SET points = points + 4, referrals = referrals + 1 WHERE telegram_id=?", (referrer_id,))
-    conn.commit()
-    conn.close()
+    with transaction(immediate=True) as c:
+        if not c.execute(INSERT_REFERRAL_SQL, (referrer_id, referred_id)).rowcount:
+            return
+        c.execute(CREDIT_REFERRER_SQL, (referrer_id,))
+    _invalidate_users(referrer_id)
 
 def add_review(user_id, review):
     """
     Adds a review from a user to the database.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("INSERT INTO reviews (user_id, review) VALUES (?, ?)", (user_id, review))
-    conn.commit()
-    conn.close()
+    execute("INSERT INTO reviews (user_id, review) VALUES (?, ?)", (user_id, review))
 
 def log_admin_action(admin_id, action):
     """
     Logs an action taken by an admin in the admin logs table.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("INSERT INTO admin_logs (admin_id, action) VALUES (?, ?)", (admin_id, action))
-    conn.commit()
-    conn.close()
+    execute("INSERT INTO admin_logs (admin_id, action) VALUES (?, ?)", (admin_id, action))
+
+###############################
+# KEYS
+###############################
+# Unclaimed keys kept in memory so /redeem can reject unknown keys without touching SQLite.
+# Filled by load_unclaimed_keys() at startup and kept current by the key writes below; this
+# assumes one bot process owns the database. Until it is loaded every key counts as a candidate.
+_unclaimed_keys = set()
+_unclaimed_keys_loaded = False
+_unclaimed_keys_lock = threading.Lock()
+
+GET_KEY_SQL = "SELECT key, type, points, claimed FROM keys WHERE key=?"
+KEY_EXISTS_SQL = "SELECT 1 FROM keys WHERE key=?"
+KEY_POINTS_SQL = "SELECT points FROM keys WHERE key=?"
+# Filled with one '?' per key
+EXISTING_KEYS_SQL = "SELECT key FROM keys WHERE key IN ({})"
+INSERT_KEY_SQL = "INSERT INTO keys (key, type, points, claimed) VALUES (?, ?, ?, 0)"
+CLAIM_KEY_SQL = "UPDATE keys SET claimed=1, claimed_by=?, claimed_at=CURRENT_TIMESTAMP WHERE key=? AND claimed=0"
+
+def load_unclaimed_keys():
+    global _unclaimed_keys_loaded
+    keys = {row[0] for row in fetchall("SELECT key FROM keys WHERE claimed=0")}
+    with _unclaimed_keys_lock:
+        _unclaimed_keys.clear()
+        _unclaimed_keys.update(keys)
+        _unclaimed_keys_loaded = True
+
+def is_unclaimed_key(key):
+    """
+    Returns False for keys that certainly cannot be redeemed; True means ask the database.
+    """
+    return not _unclaimed_keys_loaded or key in _unclaimed_keys
 
 def get_key(key):
     """
     Retrieves a specific key from the database.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT key, type, points, claimed FROM keys WHERE key=?", (key,))
-    result = c.fetchone()
-    conn.close()
-    return result
+    return fetchone(GET_KEY_SQL, (key,))
+
+def get_keys():
+    return fetchall("SELECT key, type, points, claimed, claimed_by FROM keys")
 
 def add_key(key, key_type, points):
     """
     Adds a new key (normal or premium) to the keys table.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO keys (key, type, points, claimed) VALUES (?, ?, ?, ?)", 
-              (key, key_type, points, 0))
-    conn.commit()
-    conn.close()
+    execute("INSERT OR IGNORE INTO keys (key, type, points, claimed) VALUES (?, ?, ?, ?)",
+            (key, key_type, points, 0))
+    with _unclaimed_keys_lock:
+        _unclaimed_keys.add(key)
+
+def add_keys(keys, key_type, points):
+    """
+    Inserts a batch of new keys in one transaction and returns the ones inserted.
+    Keys that already exist are left out of the result so the caller can regenerate them.
+    """
+    keys = list(keys)
+    with transaction(immediate=True) as c:
+        existing = set()
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            existing.update(row[0] for row in c.execute(
+                EXISTING_KEYS_SQL.format(','.join('?' * len(part))), part))
+        fresh = [key for key in keys if key not in existing]
+        c.executemany(INSERT_KEY_SQL, ((key, key_type, points) for key in fresh))
+    with _unclaimed_keys_lock:
+        _unclaimed_keys.update(fresh)
+    return fresh
+
+REDEEM_OK = "ok"
+REDEEM_NOT_FOUND = "not_found"
+REDEEM_ALREADY_CLAIMED = "already_claimed"
+
+def claim_keys_in_db(keys, telegram_id):
+    """
+    Redeems several keys for a user in one transaction.
+    Each key is claimed with a single conditional UPDATE (claimed=0 in the WHERE clause), so a key
+    can only ever be redeemed once even when requests race; the rowcount tells whether we won.
+    Returns [(key, status, points)] with status one of the REDEEM_* constants.
+    """
+    results = []
+    total = 0
+    with transaction(immediate=True) as c:
+        for key in keys:
+            claimed = c.execute(CLAIM_KEY_SQL, (telegram_id, key)).rowcount
+            if claimed:
+                points = c.execute(KEY_POINTS_SQL, (key,)).fetchone()[0]
+                total += points
+                results.append((key, REDEEM_OK, points))
+            elif c.execute(KEY_EXISTS_SQL, (key,)).fetchone():
+                results.append((key, REDEEM_ALREADY_CLAIMED, 0))
+            else:
+                results.append((key, REDEEM_NOT_FOUND, 0))
+        if total:
+            c.execute(ADD_USER_POINTS_SQL, (total, telegram_id))
+    if total:
+        _invalidate_users(telegram_id)
+    with _unclaimed_keys_lock:
+        _unclaimed_keys.difference_update(keys)
+    return results
 
 def claim_key_in_db(key, telegram_id):
     """
     Claims a key for the user and adds the points to their account.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT claimed, type, points FROM keys WHERE key=?", (key,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
+    [(_, status, points)] = claim_keys_in_db([key], telegram_id)
+    if status == REDEEM_NOT_FOUND:
         return "Key not found."
-    if row[0] != 0:
-        conn.close()
+    if status == REDEEM_ALREADY_CLAIMED:
         return "Key already claimed."
-    points = row[2]
-    c.execute("UPDATE keys SET claimed=1, claimed_by=? WHERE key=?", (telegram_id, key))
-    c.execute("UPDATE users SET points = points + ? WHERE telegram_id=?", (points, telegram_id))
-    conn.commit()
-    conn.close()
     return f"Key redeemed successfully. You've been awarded {points} points."
 
-def update_user_points(telegram_id, points):
+###############################
+# PLATFORMS AND STOCK
+###############################
+# Platform catalog: platform name -> stock count, in table order. Loaded on first use and kept
+# current by the writes below: platform changes edit it directly, claims decrement the count,
+# and bulk stock writes recount their platform. Counts are for display; claims always check stock_items.
+_catalog = None
+_catalog_lock = threading.RLock()
+
+# Bumped whenever the platform list changes, so views built from it know when to rebuild
+_platforms_version = 0
+
+PLATFORM_EXISTS_SQL = "SELECT 1 FROM platforms WHERE platform_name=?"
+COUNT_STOCK_SQL = "SELECT COUNT(*) FROM stock_items WHERE platform_name=?"
+LIST_STOCK_SQL = "SELECT account FROM stock_items WHERE platform_name=? ORDER BY id"
+INSERT_STOCK_SQL = "INSERT OR IGNORE INTO stock_items (platform_name, account) VALUES (?, ?)"
+DELETE_PLATFORM_STOCK_SQL = "DELETE FROM stock_items WHERE platform_name=?"
+DELETE_STOCK_ITEM_SQL = "DELETE FROM stock_items WHERE id=?"
+FIRST_STOCK_ID_SQL = "SELECT id FROM stock_items WHERE platform_name=? ORDER BY id LIMIT 1"
+LAST_STOCK_ID_SQL = "SELECT id FROM stock_items WHERE platform_name=? ORDER BY id DESC LIMIT 1"
+PICK_STOCK_SQL = "SELECT id, account FROM stock_items WHERE platform_name=? AND id>=? ORDER BY id LIMIT 1"
+INSERT_CLAIM_SQL = "INSERT INTO claims (user_id, platform_name, account, cost) VALUES (?, ?, ?, ?)"
+
+def _load_catalog():
+    global _catalog
+    _catalog = dict(fetchall(
+        "SELECT platform_name, (SELECT COUNT(*) FROM stock_items s WHERE s.platform_name = p.platform_name) "
+        "FROM platforms p"))
+
+def get_platform_catalog():
     """
-    Updates the points for a specific user.
+    Returns [(platform_name, stock_count)] for every platform, without querying once loaded.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("UPDATE users SET points=? WHERE telegram_id=?", (points, telegram_id))
-    conn.commit()
-    conn.close()
+    with _catalog_lock:
+        if _catalog is None:
+            _load_catalog()
+        return list(_catalog.items())
 
 def get_platforms():
     """
-    Retrieves all platforms from the platforms table.
+    Retrieves all platform names.
+    """
+    return [name for name, _ in get_platform_catalog()]
+
+def get_platforms_version():
+    return _platforms_version
+
+def _update_catalog(platform_name, count=None, delta=0, remove=False):
+    global _platforms_version
+    with _catalog_lock:
+        if _catalog is None:
+            return
+        if remove:
+            _catalog.pop(platform_name, None)
+            _platforms_version += 1
+        elif platform_name not in _catalog:
+            _catalog[platform_name] = count or 0
+            _platforms_version += 1
+        elif count is not None:
+            _catalog[platform_name] = count
+        else:
+            _catalog[platform_name] = max(0, _catalog[platform_name] + delta)
+
+def _recount_stock(platform_name):
+    if fetchone(PLATFORM_EXISTS_SQL, (platform_name,)):
+        _update_catalog(platform_name, count=fetchone(COUNT_STOCK_SQL, (platform_name,))[0])
+
+def add_platform(platform_name):
+    """
+    Adds a platform with empty stock. Returns an error string on failure, None on success.
+    """
+    try:
+        execute("INSERT INTO platforms (platform_name) VALUES (?)", (platform_name,))
+    except Exception as e:
+        return str(e)
+    _update_catalog(platform_name, count=0)
+    return None
+
+def remove_platform(platform_name):
+    with transaction():
+        execute(DELETE_PLATFORM_STOCK_SQL, (platform_name,))
+        execute("DELETE FROM platforms WHERE platform_name=?", (platform_name,))
+    _update_catalog(platform_name, remove=True)
+
+def get_stock_count(platform_name):
+    """
+    Returns the number of accounts in stock for a platform, from the catalog when it is a known platform.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT platform_name FROM platforms")
-    platforms = [row[0] for row in c.fetchall()]
-    conn.close()
-    return platforms
+    with _catalog_lock:
+        if _catalog is None:
+            _load_catalog()
+        count = _catalog.get(platform_name)
+    if count is None:
+        count = fetchone(COUNT_STOCK_SQL, (platform_name,))[0]
+    return count
 
 def get_stock_for_platform(platform_name):
     """
-    Retrieves the stock of accounts for a specific platform.
+    Retrieves the stock of accounts for a specific platform, oldest first.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT stock FROM platforms WHERE platform_name=?", (platform_name,))
-    row = c.fetchone()
-    conn.close()
-    if row and row[0]:
-        try:
-            return json.loads(row[0])  # Convert JSON string back into a list of accounts
-        except Exception:
-            return []
-    return []
+    return [row[0] for row in fetchall(LIST_STOCK_SQL, (platform_name,))]
 
 def update_stock_for_platform(platform_name, stock):
     """
-    Updates the stock for a given platform.
+    Replaces the whole stock for a given platform.
+    """
+    with transaction():
+        execute(DELETE_PLATFORM_STOCK_SQL, (platform_name,))
+        add_stock_to_platform(platform_name, stock)
+    _recount_stock(platform_name)
+
+def add_stock_to_platform(platform_name, accounts):
+    """
+    Appends accounts to a platform's stock, skipping ones already stocked.
+    Returns the number of accounts added.
+    """
+    with transaction() as c:
+        added = c.executemany(INSERT_STOCK_SQL, ((platform_name, account) for account in accounts)).rowcount
+    _recount_stock(platform_name)
+    return added
+
+def import_stock_lines(platform_name, lines, chunk_size=1000, progress=None):
+    """
+    Streams accounts from an iterable of lines into a platform's stock.
+    Lines are inserted in chunks of `chunk_size`, one transaction per chunk, so memory stays
+    flat and the write lock is released between chunks. Blank lines are skipped and accounts
+    already in stock (or repeated in the input) are ignored.
+    `progress(read, added)` is called after every chunk.
+    Returns (read, added).
+    """
+    read = added = 0
+    chunk = []
+    try:
+        for line in lines:
+            account = line.strip()
+            if not account:
+                continue
+            chunk.append(account)
+            if len(chunk) >= chunk_size:
+                read, added = _import_stock_chunk(platform_name, chunk, read, added, progress)
+        if chunk:
+            read, added = _import_stock_chunk(platform_name, chunk, read, added, progress)
+    finally:
+        finish_stock_import(platform_name)
+    return read, added
+
+def _import_stock_chunk(platform_name, chunk, read, added, progress):
+    added += import_stock_chunk(platform_name, chunk)
+    read += len(chunk)
+    chunk.clear()
+    if progress:
+        progress(read, added)
+    return read, added
+
+def import_stock_chunk(platform_name, accounts):
+    """
+    Inserts one chunk of an import in a single transaction and returns the number added.
+    The stock count is left alone; call finish_stock_import() once the import is over.
+    """
+    with transaction() as c:
+        return c.executemany(INSERT_STOCK_SQL, ((platform_name, account) for account in accounts)).rowcount
+
+def finish_stock_import(platform_name):
+    _recount_stock(platform_name)
+
+def pop_stock_item(platform_name):
+    """
+    Removes a random account from a platform's stock and returns it, or None when the stock is empty.
+    The pick is a random id between the platform's lowest and highest ids, resolved to the next
+    existing row, so it costs a few index seeks regardless of stock size.
+    """
+    with transaction(immediate=True) as c:
+        row = _pick_stock_item(c, platform_name)
+        if row is None:
+            return None
+        c.execute(DELETE_STOCK_ITEM_SQL, (row[0],))
+    _update_catalog(platform_name, delta=-1)
+    return row[1]
+
+CLAIM_OK = "ok"
+CLAIM_NO_USER = "no_user"
+CLAIM_INSUFFICIENT_POINTS = "insufficient_points"
+CLAIM_OUT_OF_STOCK = "out_of_stock"
+
+def claim_stock_item(telegram_id, platform_name, cost):
+    """
+    Spends `cost` points on one account from a platform's stock.
+    The stock pick, the conditional points debit, the stock delete and the claims insert
+    run in one BEGIN IMMEDIATE transaction, so two concurrent claims can never spend the
+    same points or receive the same account.
+    Returns (status, account, remaining_points); status is one of the CLAIM_* constants.
     """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("UPDATE platforms SET stock=? WHERE platform_name=?", (json.dumps(stock), platform_name))
-    conn.commit()
-    conn.close()
+    with transaction(immediate=True) as c:
+        row = _pick_stock_item(c, platform_name)
+        if row is None:
+            return CLAIM_OUT_OF_STOCK, None, None
+        debit = c.execute(DEBIT_USER_POINTS_SQL, (cost, telegram_id, cost))
+        if debit.rowcount == 0:
+            if c.execute(USER_EXISTS_SQL, (telegram_id,)).fetchone() is None:
+                return CLAIM_NO_USER, None, None
+            return CLAIM_INSUFFICIENT_POINTS, None, None
+        c.execute(DELETE_STOCK_ITEM_SQL, (row[0],))
+        c.execute(INSERT_CLAIM_SQL, (telegram_id, platform_name, row[1], cost))
+        points = c.execute(USER_POINTS_SQL, (telegram_id,)).fetchone()[0]
+    _invalidate_users(telegram_id)
+    _update_catalog(platform_name, delta=-1)
+    return CLAIM_OK, row[1], points
+
+def _pick_stock_item(c, platform_name):
+    lo = c.execute(FIRST_STOCK_ID_SQL, (platform_name,)).fetchone()
+    if lo is None:
+        return None
+    hi = c.execute(LAST_STOCK_ID_SQL, (platform_name,)).fetchone()
+    pick = random.randint(lo[0], hi[0])
+    return c.execute(PICK_STOCK_SQL, (platform_name, pick)).fetchone()
+
+###############################
+# CHANNELS AND ADMINS
+###############################
+def get_channels():
+    return fetchall("SELECT id, channel_link FROM channels")
+
+def add_channel(channel_link):
+    execute("INSERT INTO channels (channel_link) VALUES (?)", (channel_link,))
+
+def remove_channel(channel_id):
+    execute("DELETE FROM channels WHERE id=?", (channel_id,))
+
+# Lowercased Telegram IDs and usernames allowed in as owners and admins
+Authorization = namedtuple("Authorization", "owner_ids owner_names admin_ids admin_names")
+
+# config.OWNERS/ADMINS merged with the admins table; rebuilt whenever the admin functions below write
+_authorization = None
+
+def _split_ids_and_names(entries):
+    ids, names = set(), set()
+    for entry in entries:
+        entry = str(entry).lower()
+        (ids if entry.lstrip("-").isdigit() else names).add(entry)
+    return ids, names
+
+def load_authorization():
+    global _authorization
+    owners = [str(x) for x in config.OWNERS]
+    admins = [str(x) for x in config.ADMINS]
+    banned = set()
+    for user_id, username, role, is_banned in get_admins():
+        if is_banned:
+            banned.update(x.lower() for x in (user_id, username) if x)
+            continue
+        target = owners if role == "owner" else admins
+        target.extend(x for x in (user_id, username) if x)
+    owner_ids, owner_names = _split_ids_and_names(owners)
+    admin_ids, admin_names = _split_ids_and_names(admins)
+    # A ban in the admins table overrides config.ADMINS, but never config.OWNERS
+    _authorization = Authorization(frozenset(owner_ids), frozenset(owner_names),
+                                   frozenset((admin_ids | owner_ids) - (banned - owner_ids)),
+                                   frozenset((admin_names | owner_names) - (banned - owner_names)))
+    return _authorization
+
+def get_authorization():
+    return _authorization or load_authorization()
+
+def get_admins():
+    return fetchall("SELECT user_id, username, role, banned FROM admins")
+
+def add_admin(user_id, username, role="admin"):
+    execute("INSERT OR REPLACE INTO admins (user_id, username, role, banned) VALUES (?, ?, ?, 0)",
+            (str(user_id), username, role))
+    load_authorization()
+
+def remove_admin(user_id):
+    execute("DELETE FROM admins WHERE user_id=?", (str(user_id),))
+    load_authorization()
+
+def ban_admin(user_id):
+    execute("UPDATE admins SET banned=1 WHERE user_id=?", (str(user_id),))
+    load_authorization()
+
+def unban_admin(user_id):
+    execute("UPDATE admins SET banned=0 WHERE user_id=?", (str(user_id),))
+    load_authorization()
+
+###############################
+# QUERY PLANS
+###############################
+# The per-user/per-key statements above, with sample parameters for check_query_plans().
+# Entries reference the same constants the functions run, so the check cannot drift from them;
+# give new hot statements a constant and list it here so a missing index fails init_db().
+HOT_QUERIES = (
+    (GET_USER_SQL, ("1",)),
+    (USER_EXISTS_SQL, ("1",)),
+    (USER_POINTS_SQL, ("1",)),
+    (SET_USER_POINTS_SQL, (0, "1")),
+    (ADD_USER_POINTS_SQL, (1, "1")),
+    (DEBIT_USER_POINTS_SQL, (1, "1", 1)),
+    (SET_PENDING_REFERRER_SQL, ("2", "1")),
+    (SET_USER_BANNED_SQL, (1, "1")),
+    (SET_USER_BLOCKED_SQL, (1, "1")),
+    (COUNT_RECIPIENTS_SQL, ()),
+    (RECIPIENTS_PAGE_SQL, ("1", 100)),
+    (GET_BROADCAST_SQL, (1,)),
+    (SAVE_BROADCAST_PROGRESS_SQL, ("1", 0, 0, 0, "running", 1)),
+    (INSERT_REFERRAL_SQL, ("1", "2")),
+    (CREDIT_REFERRER_SQL, ("1",)),
+    (GET_KEY_SQL, ("KEY",)),
+    (KEY_EXISTS_SQL, ("KEY",)),
+    (KEY_POINTS_SQL, ("KEY",)),
+    (EXISTING_KEYS_SQL.format("?,?"), ("KEY1", "KEY2")),
+    (CLAIM_KEY_SQL, ("1", "KEY")),
+    (PLATFORM_EXISTS_SQL, ("P",)),
+    (COUNT_STOCK_SQL, ("P",)),
+    (LIST_STOCK_SQL, ("P",)),
+    (INSERT_STOCK_SQL, ("P", "account")),
+    (DELETE_PLATFORM_STOCK_SQL, ("P",)),
+    (DELETE_STOCK_ITEM_SQL, (1,)),
+    (FIRST_STOCK_ID_SQL, ("P",)),
+    (LAST_STOCK_ID_SQL, ("P",)),
+    (PICK_STOCK_SQL, ("P", 1)),
+)
+
+def check_query_plans(queries=HOT_QUERIES):
+    """
+    Runs EXPLAIN QUERY PLAN on each query and returns [(sql, plan step)] for every full table scan.
+    Index scans are fine; an empty list means every query is served by an index.
+    """
+    scans = []
+    conn = get_connection()
+    for sql, params in queries:
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[-1]
+            if detail.startswith("SCAN") and "INDEX" not in detail and "CONSTANT ROW" not in detail:
+                scans.append((sql, detail))
+    return scans
+
+# Record every public db call; connection plumbing, the generic query helpers (already counted
+# under the function that called them) and startup-only schema work are left out
+instrument_module(globals(), "db", exclude=("get_connection", "close_connection", "transaction", "execute",
+                                            "fetchone", "fetchall", "init_db", "migrate", "chunked",
+                                            "check_query_plans"))
 
 if __name__ == '__main__':
     init_db()
     print("✅ Database initialized!")
-    
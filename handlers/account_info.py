@@ -3,9 +3,9 @@ from db import get_user, add_user
 from datetime import datetime
 import telebot
 
-def send_account_info(bot, update):
+def build_account_info(update):
     """
-    Sends the account information for the user who triggered the update.
+    Builds (chat_id, text) with the account information for the user who triggered the update.
     This version displays the sender's Telegram user ID (from_user.id) as the User ID.
     Works with both Message and CallbackQuery objects.
     """
@@ -25,23 +25,25 @@ def send_account_info(bot, update):
         )
         user = get_user(telegram_id)
     
-    # Database schema for users is assumed to be:
-    # (telegram_id, internal_id, username, join_date, points, referrals, banned, pending_referrer)
-    # We now display only the Telegram ID (user[0]) as the "User ID".
-    
     # Checking if the user is requesting their own account info
     if str(update.from_user.id) == telegram_id:
         text = (
             f"<b>👤 Account Info 😁</b>\n"
-            f"• <b>Username:</b> {user[2]}\n"
-            f"• <b>User ID:</b> {user[0]}\n"
-            f"• <b>Join Date:</b> {user[3]}\n"
-            f"• <b>Balance:</b> {user[4]} points\n"
-            f"• <b>Total Referrals:</b> {user[5]}\n"
+            f"• <b>Username:</b> {user.username}\n"
+            f"• <b>User ID:</b> {user.telegram_id}\n"
+            f"• <b>Join Date:</b> {user.join_date}\n"
+            f"• <b>Balance:</b> {user.points} points\n"
+            f"• <b>Total Referrals:</b> {user.referrals}\n"
         )
     else:
         text = "<b>🚫 You are trying to view someone else's account info. Access Denied.</b>"
+    return chat_id, text
+
+def send_account_info(bot, update):
+    """
+    Sends the account information for the user who triggered the update.
+    """
+    chat_id, text = build_account_info(update)
 
     # Sending the message with account info or access denied message
     bot.send_message(chat_id, text, parse_mode="HTML")
-    
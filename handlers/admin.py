@@ -1,228 +1,118 @@
 # handlers/admin.py
-import telebot
-from telebot import types
-import sqlite3
-import random, string, json, re
+from telebot import types, apihelper
+import asyncio, secrets, string, csv, time, io, html
 import config
-from db import DATABASE, log_admin_action, add_key
-
-def get_db_connection():
-    return sqlite3.connect(getattr(config, "DATABASE", "bot.db"))
+from client import session
+from keyboards import cached_keyboard
+from outbox import outbox
+from broadcast import start_broadcast, BROADCAST_STARTING_TEXT
+from metrics import format_stats
+from db import (
+    log_admin_action, add_keys, get_keys,
+    add_platform, remove_platform, get_platforms, get_platforms_version, add_stock_to_platform, import_stock_lines,
+    get_channels, add_channel, remove_channel,
+    get_admins, add_admin, remove_admin, ban_admin, unban_admin, get_authorization,
+    get_users, ban_user, unban_user,
+)
 
 ###############################
-# PLATFORM MANAGEMENT FUNCTIONS
+# KEYS MANAGEMENT FUNCTIONS
 ###############################
-def add_platform(platform_name):
-    conn = get_db_connection()
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO platforms (platform_name, stock) VALUES (?, ?)", (platform_name, json.dumps([])))
-        conn.commit()
-    except Exception as e:
-        conn.close()
-        return str(e)
-    conn.close()
-    return None
-
-def remove_platform(platform_name):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM platforms WHERE platform_name=?", (platform_name,))
-    conn.commit()
-    conn.close()
-
-def get_platforms():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT platform_name FROM platforms")
-    rows = c.fetchall()
-    conn.close()
-    return [row[0] for row in rows]
-
-def add_stock_to_platform(platform_name, accounts):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT stock FROM platforms WHERE platform_name=?", (platform_name,))
-    row = c.fetchone()
-    if row and row[0]:
-        stock = json.loads(row[0])
-    else:
-        stock = []
-    stock.extend(accounts)
-    c.execute("UPDATE platforms SET stock=? WHERE platform_name=?", (json.dumps(stock), platform_name))
-    conn.commit()
-    conn.close()
+KEY_ALPHABET = string.ascii_uppercase + string.digits
+GEN_MAX_KEYS = getattr(config, "GEN_MAX_KEYS", 100000)
+# Telegram's message length limit; longer key lists are sent as a .txt document
+MESSAGE_LIMIT = 4096
 
-###############################
-# CHANNEL MANAGEMENT FUNCTIONS
-###############################
-def get_channels():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT id, channel_link FROM channels")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def add_channel(channel_link):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("INSERT INTO channels (channel_link) VALUES (?)", (channel_link,))
-    conn.commit()
-    conn.close()
-
-def remove_channel(channel_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM channels WHERE id=?", (channel_id,))
-    conn.commit()
-    conn.close()
+def generate_normal_key():
+    return "NKEY-" + ''.join(secrets.choice(KEY_ALPHABET) for _ in range(10))
 
-###############################
-# ADMINS MANAGEMENT FUNCTIONS
-###############################
-def get_admins():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT user_id, username, role, banned FROM admins")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def add_admin(user_id, username, role="admin"):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO admins (user_id, username, role, banned) VALUES (?, ?, ?, 0)",
-              (str(user_id), username, role))
-    conn.commit()
-    conn.close()
-
-def remove_admin(user_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM admins WHERE user_id=?", (str(user_id),))
-    conn.commit()
-    conn.close()
-
-def ban_admin(user_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("UPDATE admins SET banned=1 WHERE user_id=?", (str(user_id),))
-    conn.commit()
-    conn.close()
-
-def unban_admin(user_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("UPDATE admins SET banned=0 WHERE user_id=?", (str(user_id),))
-    conn.commit()
-    conn.close()
+def generate_premium_key():
+    return "PKEY-" + ''.join(secrets.choice(KEY_ALPHABET) for _ in range(10))
 
-###############################
-# USERS MANAGEMENT FUNCTIONS
-###############################
-def get_users():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT telegram_id, username, banned FROM users")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def ban_user(user_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET banned=1 WHERE telegram_id=?", (str(user_id),))
-    conn.commit()
-    conn.close()
-
-def unban_user(user_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET banned=0 WHERE telegram_id=?", (str(user_id),))
-    conn.commit()
-    conn.close()
+# key type -> (generator, points awarded on redeem)
+KEY_TYPES = {
+    "normal": (generate_normal_key, 15),
+    "premium": (generate_premium_key, 35),
+}
 
-###############################
-# KEYS MANAGEMENT FUNCTIONS
-###############################
-def generate_normal_key():
-    return "NKEY-" + ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+def generate_keys(key_type, qty):
+    """
+    Generates and stores `qty` keys of the given type. Returns the keys, or None for an unknown type.
+    """
+    if key_type not in KEY_TYPES:
+        return None
+    generator, points = KEY_TYPES[key_type]
+    generated = []
+    # Keys are inserted in one batch; the rare collisions are regenerated in a follow-up batch
+    while len(generated) < qty:
+        batch = {generator() for _ in range(qty - len(generated))}
+        generated.extend(add_keys(batch, key_type, points))
+    return generated
 
-def generate_premium_key():
-    return "PKEY-" + ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-
-def add_key(key, key_type, points):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("INSERT INTO keys (key, type, points, claimed) VALUES (?, ?, ?, 0)", (key, key_type, points))
-    conn.commit()
-    conn.close()
-
-def get_keys():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT key, type, points, claimed, claimed_by FROM keys")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def claim_key_in_db(key, user_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT claimed, type, points FROM keys WHERE key=?", (key,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        return "Key not found."
-    if row[0] != 0:
-        conn.close()
-        return "Key already claimed."
-    points = row[2]
-    c.execute("UPDATE keys SET claimed=1, claimed_by=? WHERE key=?", (user_id, key))
-    c.execute("UPDATE users SET points = points + ? WHERE telegram_id=?", (points, user_id))
-    conn.commit()
-    conn.close()
-    return f"Key redeemed successfully. You've been awarded {points} points."
+def keys_file(keys, key_type):
+    document = io.BytesIO("\n".join(keys).encode("utf-8"))
+    document.name = f"{key_type}_keys_{len(keys)}.txt"
+    return document
+
+def send_keys(bot, chat_id, header, keys, key_type, **kwargs):
+    """
+    Sends generated keys as one message, or as a .txt document when they would not fit.
+    Returns the bot call's result, so AsyncTeleBot callers can await it.
+    """
+    text = header + "\n" + "\n".join(keys)
+    if len(text) <= MESSAGE_LIMIT:
+        return bot.send_message(chat_id, text, **kwargs)
+    return bot.send_document(chat_id, keys_file(keys, key_type), caption=f"{header} ({len(keys)})", **kwargs)
+
+def queue_keys(bot, chat_id, header, keys, key_type):
+    """
+    Same as send_keys, through the outbox.
+    """
+    text = header + "\n" + "\n".join(keys)
+    if len(text) <= MESSAGE_LIMIT:
+        outbox.send_message(bot, chat_id, text)
+        return
+    caption = f"{header} ({len(keys)})"
+    # The file is built on every attempt: a retried send would otherwise upload an already-read buffer
+    if asyncio.iscoroutinefunction(bot.send_document):
+        async def send_document():
+            return await bot.send_document(chat_id, keys_file(keys, key_type), caption=caption)
+    else:
+        def send_document():
+            return bot.send_document(chat_id, keys_file(keys, key_type), caption=caption)
+    outbox.submit(chat_id, send_document)
 
 ###############################
 # ADMIN PANEL HANDLERS & SECURITY
 ###############################
+def _identity(user_or_id):
+    try:
+        return str(user_or_id.id), (user_or_id.username or "").lower()
+    except AttributeError:
+        return str(user_or_id).lower(), ""
+
 def is_owner(user_or_id):
     if user_or_id is None:
         return False
-    try:
-        tid = str(user_or_id.id)
-        uname = (user_or_id.username or "").lower()
-    except AttributeError:
-        tid = str(user_or_id)
-        uname = ""
-    owners = [str(x).lower() for x in config.OWNERS]
-    if tid.lower() in owners or (uname and uname in owners):
-        print(f"DEBUG is_owner: {tid} or {uname} recognized as owner.")
-        return True
-    return False
+    tid, uname = _identity(user_or_id)
+    auth = get_authorization()
+    return tid in auth.owner_ids or (uname != "" and uname in auth.owner_names)
 
 def is_admin(user_or_id):
-    if is_owner(user_or_id):
-        return True
+    """
+    True for owners and admins. Both lists are precomputed sets (see db.get_authorization).
+    """
     if user_or_id is None:
         return False
-    try:
-        tid = str(user_or_id.id)
-        uname = (user_or_id.username or "").lower()
-    except AttributeError:
-        tid = str(user_or_id)
-        uname = ""
-    admins = [str(x).lower() for x in config.ADMINS]
-    if tid.lower() in admins or (uname and uname in admins):
-        print(f"DEBUG is_admin: {tid} or {uname} recognized as admin.")
-        return True
-    return False
+    tid, uname = _identity(user_or_id)
+    auth = get_authorization()
+    return tid in auth.admin_ids or (uname != "" and uname in auth.admin_names)
 
-def send_admin_menu(bot, message):
+ADMIN_MENU_TEXT = "<b>🛠 Admin Panel</b> 🛠"
+
+def build_admin_menu_markup(user):
     markup = types.InlineKeyboardMarkup(row_width=2)
-    if is_owner(message.from_user):
+    if is_owner(user):
         markup.add(
             types.InlineKeyboardButton("📺 Platform Mgmt", callback_data="admin_platform"),
             types.InlineKeyboardButton("📈 Stock Mgmt", callback_data="admin_stock"),
@@ -237,7 +127,154 @@ def send_admin_menu(bot, message):
             types.InlineKeyboardButton("👤 User Mgmt", callback_data="admin_users")
         )
     markup.add(types.InlineKeyboardButton("🔙 Main Menu", callback_data="back_main"))
-    bot.send_message(message.chat.id, "<b>🛠 Admin Panel</b> 🛠", parse_mode="HTML", reply_markup=markup)
+    return markup
+
+def get_admin_menu_keyboard(user):
+    role = "owner" if is_owner(user) else "admin"
+    return cached_keyboard(("admin_menu", role), build_admin_menu_markup, user)
+
+def send_admin_menu(bot, message):
+    bot.send_message(message.chat.id, ADMIN_MENU_TEXT, parse_mode="HTML",
+                     reply_markup=get_admin_menu_keyboard(message.from_user))
+
+###############################
+# STOCK MANAGEMENT
+###############################
+STOCK_UPLOAD_EXTENSIONS = (".txt", ".csv")
+STOCK_IMPORT_CHUNK_SIZE = getattr(config, "STOCK_IMPORT_CHUNK_SIZE", 1000)
+STOCK_IMPORT_PROGRESS_INTERVAL = 3  # seconds between progress message edits
+STOCK_UPLOAD_PROMPT = "📤 Send a <b>.txt</b> or <b>.csv</b> file with one account per line for <b>{platform}</b>."
+STOCK_UPLOAD_INVALID_TEXT = "❌ Please send the stock as a .txt or .csv document."
+STOCK_IMPORT_STARTED_TEXT = "⏳ Importing stock for <b>{platform}</b>..."
+STOCK_IMPORT_PROGRESS_TEXT = "⏳ Importing stock for <b>{platform}</b>...\nRead: {read} • Added: {added}"
+STOCK_IMPORT_DONE_TEXT = ("✅ Import finished for <b>{platform}</b>\n"
+                          "• Lines read: {read}\n"
+                          "• Accounts added: {added}\n"
+                          "• Duplicates skipped: {skipped}")
+STOCK_IMPORT_FAILED_TEXT = "❌ Import failed. Check the file and try again."
+STOCK_MENU_TEXT = "<b>📈 Stock Mgmt</b>\nChoose a platform to add stock to:"
+NO_PLATFORMS_ADMIN_TEXT = "No platforms yet. Add one first."
+
+def build_stock_platforms_markup():
+    platforms = get_platforms()
+    if not platforms:
+        return None
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    for platform in platforms:
+        markup.add(types.InlineKeyboardButton(f"📺 {platform}", callback_data=f"admin_stock_{platform}"))
+    markup.add(types.InlineKeyboardButton("🔙 Back", callback_data="menu_admin"))
+    return markup
+
+def get_stock_platforms_keyboard():
+    return cached_keyboard(("admin_stock", get_platforms_version()), build_stock_platforms_markup)
+
+def handle_admin_stock(bot, call):
+    markup = get_stock_platforms_keyboard()
+    if markup is None:
+        bot.answer_callback_query(call.id, NO_PLATFORMS_ADMIN_TEXT)
+        return
+    bot.edit_message_text(STOCK_MENU_TEXT,
+                          chat_id=call.message.chat.id, message_id=call.message.message_id,
+                          parse_mode="HTML", reply_markup=markup)
+
+def handle_admin_stock_platform(bot, call, platform):
+    bot.answer_callback_query(call.id)
+    msg = bot.send_message(call.message.chat.id, STOCK_UPLOAD_PROMPT.format(platform=platform), parse_mode="HTML")
+    bot.register_next_step_handler(msg, process_stock_upload, bot, platform)
+
+def iter_stock_file(bot, file_id, file_name):
+    """
+    Streams an uploaded stock file from Telegram line by line, without holding it in memory.
+    CSV rows are joined with ':' so a user,password file becomes user:password accounts.
+    """
+    file_info = bot.get_file(file_id)
+    url = (apihelper.FILE_URL or "https://api.telegram.org/file/bot{0}/{1}").format(bot.token, file_info.file_path)
+    with session.get(url, stream=True, timeout=(10, 60)) as resp:
+        resp.raise_for_status()
+        lines = (raw.decode("utf-8", errors="ignore") for raw in resp.iter_lines())
+        if file_name.lower().endswith(".csv"):
+            for row in csv.reader(lines):
+                yield ":".join(cell.strip() for cell in row if cell.strip())
+        else:
+            yield from lines
+
+def log_import_failure(bot, platform, error):
+    """
+    Logs a failed stock import. Download errors carry the file URL, which embeds the bot token.
+    """
+    print(f"Stock import for {platform} failed: {str(error).replace(bot.token, '<token>')}")
+
+def is_stock_document(document):
+    return document is not None and (document.file_name or "").lower().endswith(STOCK_UPLOAD_EXTENSIONS)
+
+def process_stock_upload(message, bot, platform):
+    if not is_admin(message.from_user):
+        return
+    document = message.document
+    if not is_stock_document(document):
+        bot.reply_to(message, STOCK_UPLOAD_INVALID_TEXT)
+        return
+
+    status = bot.reply_to(message, STOCK_IMPORT_STARTED_TEXT.format(platform=platform), parse_mode="HTML")
+    last_edit = [time.monotonic()]
+
+    def report(read, added):
+        now = time.monotonic()
+        if now - last_edit[0] < STOCK_IMPORT_PROGRESS_INTERVAL:
+            return
+        last_edit[0] = now
+        try:
+            bot.edit_message_text(STOCK_IMPORT_PROGRESS_TEXT.format(platform=platform, read=read, added=added),
+                                  chat_id=status.chat.id, message_id=status.message_id, parse_mode="HTML")
+        except Exception as e:
+            print(f"Error updating import progress: {e}")
+
+    try:
+        read, added = import_stock_lines(platform, iter_stock_file(bot, document.file_id, document.file_name),
+                                         chunk_size=STOCK_IMPORT_CHUNK_SIZE, progress=report)
+    except Exception as e:
+        log_import_failure(bot, platform, e)
+        bot.edit_message_text(STOCK_IMPORT_FAILED_TEXT, chat_id=status.chat.id, message_id=status.message_id)
+        return
+
+    log_admin_action(message.from_user.id, f"Imported {added} accounts to {platform}")
+    bot.edit_message_text(STOCK_IMPORT_DONE_TEXT.format(platform=platform, read=read, added=added, skipped=read - added),
+                          chat_id=status.chat.id, message_id=status.message_id, parse_mode="HTML")
+
+###############################
+# BROADCAST
+###############################
+BROADCAST_USAGE_TEXT = "Usage: /broadcast <message>"
+
+def get_broadcast_text(message):
+    """
+    Returns the message after the /broadcast command, keeping its formatting as HTML.
+    """
+    return (getattr(message, "html_text", None) or message.text).partition(" ")[2].strip()
+
+def handle_broadcast_command(bot, message):
+    if not is_admin(message.from_user):
+        bot.reply_to(message, "🚫 You do not have permission to broadcast.")
+        return
+    text = get_broadcast_text(message)
+    if not text:
+        bot.reply_to(message, BROADCAST_USAGE_TEXT)
+        return
+    status = bot.reply_to(message, BROADCAST_STARTING_TEXT)
+    broadcast_id = start_broadcast(bot, message.from_user.id, text, status)
+    log_admin_action(message.from_user.id, f"Started broadcast #{broadcast_id}")
+
+###############################
+# STATS
+###############################
+def build_stats_text():
+    return f"<b>📊 Stats</b>\n<pre>{html.escape(format_stats())}</pre>"
+
+def handle_stats_command(bot, message):
+    if not is_admin(message.from_user):
+        bot.reply_to(message, "🚫 You do not have permission to view stats.")
+        return
+    bot.reply_to(message, build_stats_text(), parse_mode="HTML")
 
 ###############################
 # KEY GENERATION AND ADMIN LOGGING
@@ -246,72 +283,35 @@ def handle_admin_add_key(bot, call):
     # Handle admin key generation, logging, and notification
     key_type = call.data.split("_")[1]
     qty = int(call.data.split("_")[2])
-    generated = []
-
-    if key_type == "normal":
-        for _ in range(qty):
-            key = generate_normal_key()
-            add_key(key, "normal", 15)
-            generated.append(key)
-    elif key_type == "premium":
-        for _ in range(qty):
-            key = generate_premium_key()
-            add_key(key, "premium", 35)
-            generated.append(key)
+    generated = generate_keys(key_type, qty) or []
 
     action = f"Generated {len(generated)} {key_type} keys"
     log_admin_action(call.from_user.id, action)
 
     # Notify the owners about the key generation
-    bot = telebot.TeleBot(config.TOKEN)
     for owner in config.OWNERS:
-        bot.send_message(owner, f"Admin {call.from_user.username} has generated keys: \n" + "\n".join(generated))
+        queue_keys(bot, owner, f"Admin {call.from_user.username} has generated keys:", generated, key_type)
 
-    bot.send_message(call.message.chat.id, f"Generated keys:\n" + "\n".join(generated))
+    send_keys(bot, call.message.chat.id, "Generated keys:", generated, key_type)
 
 ###############################
-# CALLBACK ROUTER
+# CALLBACK ROUTES
 ###############################
-def admin_callback_handler(bot, call):
-    data = call.data
-    if not is_admin(call.from_user):
-        bot.answer_callback_query(call.id, "Access prohibited.")
-        return
-    if data == "admin_platform":
-        handle_admin_platform(bot, call)
-    elif data == "admin_platform_add":
-        handle_admin_platform_add(bot, call)
-    elif data == "admin_platform_remove":
-        handle_admin_platform_remove(bot, call)
-    elif data.startswith("admin_platform_rm_"):
-        platform = data.split("admin_platform_rm_")[1]
-        handle_admin_platform_rm(bot, call, platform)
-    elif data == "admin_stock":
-        handle_admin_stock(bot, call)
-    elif data.startswith("admin_stock_"):
-        platform = data.split("admin_stock_")[1]
-        handle_admin_stock_platform(bot, call, platform)
-    elif data == "admin_channel":
-        handle_admin_channel(bot, call)
-    elif data == "admin_channel_add":
-        handle_admin_channel_add(bot, call)
-    elif data == "admin_channel_remove":
-        handle_admin_channel_remove(bot, call)
-    elif data.startswith("admin_channel_rm_"):
-        channel_id = data.split("admin_channel_rm_")[1]
-        handle_admin_channel_rm(bot, call, channel_id)
-    elif data == "admin_manage":
-        handle_admin_manage(bot, call)
-    elif data == "admin_list":
-        handle_admin_list(bot, call)
-    elif data == "admin_ban_unban":
-        handle_admin_ban_unban(bot, call)
-    elif data == "admin_remove":
-        handle_admin_remove(bot, call)
-    elif data == "admin_add":
-        handle_admin_add(bot, call)
-    elif data == "admin_add_owner":
-        handle_admin_add_owner(bot, call)
-    else:
-        bot.answer_callback_query(call.id, "❓ Unknown admin command.")
-    
+def admin_only(bot, handler):
+    """
+    Wraps handler(bot, call, *args) as a router handler that refuses non-admins.
+    """
+    def guarded(call, *args):
+        if not is_admin(call.from_user):
+            bot.answer_callback_query(call.id, "Access prohibited.")
+            return
+        return handler(bot, call, *args)
+    return guarded
+
+def register_admin_routes(router, bot):
+    """
+    Adds the admin panel callbacks to the router. Sections without handlers yet (platform,
+    channel, admin and user management) are left out and get the router's unknown answer.
+    """
+    router.add_exact("admin_stock", admin_only(bot, handle_admin_stock))
+    router.add_prefix("admin_stock_", admin_only(bot, handle_admin_stock_platform))
@@ -0,0 +1,19 @@
+# handlers/aio/__init__.py
+# Async counterparts of the handlers in handlers/, used by async_main.py on AsyncTeleBot.
+# Bot API calls are awaited; SQLite work runs on a small thread pool via run_db so it never
+# blocks the event loop. Text and keyboards are shared with the sync handlers.
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import config
+
+DB_EXECUTOR_WORKERS = getattr(config, "DB_EXECUTOR_WORKERS", 4)
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+async def run_db(func, *args, **kwargs):
+    """
+    Runs a blocking db function on the database thread pool and awaits its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, partial(func, *args, **kwargs))
@@ -0,0 +1,10 @@
+# handlers/aio/account_info.py
+from handlers.account_info import build_account_info
+from handlers.aio import run_db
+
+async def send_account_info(bot, update):
+    """
+    Sends the account information for the user who triggered the update.
+    """
+    chat_id, text = await run_db(build_account_info, update)
+    await bot.send_message(chat_id, text, parse_mode="HTML")
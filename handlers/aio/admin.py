@@ -0,0 +1,148 @@
+# handlers/aio/admin.py
+import asyncio
+import csv
+import time
+from telebot import apihelper, asyncio_helper
+from cache import TTLCache
+from broadcast import start_broadcast, BROADCAST_STARTING_TEXT
+from db import import_stock_chunk, finish_stock_import, log_admin_action
+from handlers.admin import (
+    is_admin, get_admin_menu_keyboard, get_stock_platforms_keyboard, is_stock_document,
+    ADMIN_MENU_TEXT, STOCK_MENU_TEXT, NO_PLATFORMS_ADMIN_TEXT, STOCK_UPLOAD_PROMPT, STOCK_UPLOAD_INVALID_TEXT,
+    STOCK_IMPORT_STARTED_TEXT, STOCK_IMPORT_PROGRESS_TEXT, STOCK_IMPORT_DONE_TEXT, STOCK_IMPORT_FAILED_TEXT, log_import_failure,
+    STOCK_IMPORT_CHUNK_SIZE, STOCK_IMPORT_PROGRESS_INTERVAL,
+    get_broadcast_text, BROADCAST_USAGE_TEXT, build_stats_text,
+)
+from handlers.aio import run_db
+
+# chat id -> platform whose stock file we are waiting for
+_awaiting_stock = TTLCache(maxsize=1000, ttl=600)
+
+async def send_admin_menu(bot, message):
+    await bot.send_message(message.chat.id, ADMIN_MENU_TEXT, parse_mode="HTML",
+                           reply_markup=get_admin_menu_keyboard(message.from_user))
+
+###############################
+# STOCK MANAGEMENT
+###############################
+async def handle_admin_stock(bot, call):
+    markup = await run_db(get_stock_platforms_keyboard)
+    if markup is None:
+        await bot.answer_callback_query(call.id, NO_PLATFORMS_ADMIN_TEXT)
+        return
+    await bot.edit_message_text(STOCK_MENU_TEXT,
+                                chat_id=call.message.chat.id, message_id=call.message.message_id,
+                                parse_mode="HTML", reply_markup=markup)
+
+async def handle_admin_stock_platform(bot, call, platform):
+    await bot.answer_callback_query(call.id)
+    await bot.send_message(call.message.chat.id, STOCK_UPLOAD_PROMPT.format(platform=platform), parse_mode="HTML")
+    _awaiting_stock.set(call.message.chat.id, platform)
+
+def is_awaiting_stock_upload(message):
+    return message.chat.id in _awaiting_stock
+
+async def iter_stock_file(bot, file_id, file_name):
+    """
+    Streams an uploaded stock file from Telegram line by line, without holding it in memory.
+    CSV rows are joined with ':' so a user,password file becomes user:password accounts.
+    """
+    file_info = await bot.get_file(file_id)
+    url = (apihelper.FILE_URL or "https://api.telegram.org/file/bot{0}/{1}").format(bot.token, file_info.file_path)
+    is_csv = file_name.lower().endswith(".csv")
+    session = await asyncio_helper.session_manager.get_session()
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        async for raw in resp.content:
+            line = raw.decode("utf-8", errors="ignore")
+            if is_csv:
+                row = next(csv.reader([line]), [])
+                line = ":".join(cell.strip() for cell in row if cell.strip())
+            yield line
+
+async def process_stock_upload(bot, message):
+    platform = _awaiting_stock.pop(message.chat.id)
+    if platform is None or not is_admin(message.from_user):
+        return
+    document = message.document
+    if not is_stock_document(document):
+        await bot.reply_to(message, STOCK_UPLOAD_INVALID_TEXT)
+        return
+
+    status = await bot.reply_to(message, STOCK_IMPORT_STARTED_TEXT.format(platform=platform), parse_mode="HTML")
+    read = added = 0
+    last_edit = time.monotonic()
+    chunk = []
+    try:
+        async for line in iter_stock_file(bot, document.file_id, document.file_name):
+            account = line.strip()
+            if account:
+                chunk.append(account)
+            if len(chunk) < STOCK_IMPORT_CHUNK_SIZE:
+                continue
+            added += await run_db(import_stock_chunk, platform, chunk)
+            read += len(chunk)
+            chunk = []
+            if time.monotonic() - last_edit >= STOCK_IMPORT_PROGRESS_INTERVAL:
+                last_edit = time.monotonic()
+                try:
+                    await bot.edit_message_text(STOCK_IMPORT_PROGRESS_TEXT.format(platform=platform, read=read, added=added),
+                                                chat_id=status.chat.id, message_id=status.message_id, parse_mode="HTML")
+                except Exception as e:
+                    print(f"Error updating import progress: {e}")
+        if chunk:
+            added += await run_db(import_stock_chunk, platform, chunk)
+            read += len(chunk)
+    except Exception as e:
+        log_import_failure(bot, platform, e)
+        await bot.edit_message_text(STOCK_IMPORT_FAILED_TEXT, chat_id=status.chat.id, message_id=status.message_id)
+        return
+    finally:
+        # Chunks skip the stock recount; do it once for the whole import
+        await run_db(finish_stock_import, platform)
+
+    await run_db(log_admin_action, message.from_user.id, f"Imported {added} accounts to {platform}")
+    await bot.edit_message_text(STOCK_IMPORT_DONE_TEXT.format(platform=platform, read=read, added=added, skipped=read - added),
+                                chat_id=status.chat.id, message_id=status.message_id, parse_mode="HTML")
+
+###############################
+# BROADCAST
+###############################
+async def handle_broadcast_command(bot, message):
+    if not is_admin(message.from_user):
+        await bot.reply_to(message, "🚫 You do not have permission to broadcast.")
+        return
+    text = get_broadcast_text(message)
+    if not text:
+        await bot.reply_to(message, BROADCAST_USAGE_TEXT)
+        return
+    status = await bot.reply_to(message, BROADCAST_STARTING_TEXT)
+    broadcast_id = await run_db(start_broadcast, bot, message.from_user.id, text, status, asyncio.get_running_loop())
+    await run_db(log_admin_action, message.from_user.id, f"Started broadcast #{broadcast_id}")
+
+###############################
+# STATS
+###############################
+async def handle_stats_command(bot, message):
+    if not is_admin(message.from_user):
+        await bot.reply_to(message, "🚫 You do not have permission to view stats.")
+        return
+    await bot.reply_to(message, build_stats_text(), parse_mode="HTML")
+
+###############################
+# CALLBACK ROUTES
+###############################
+def admin_only(bot, handler):
+    """
+    Wraps handler(bot, call, *args) as a router handler that refuses non-admins.
+    """
+    async def guarded(call, *args):
+        if not is_admin(call.from_user):
+            await bot.answer_callback_query(call.id, "Access prohibited.")
+            return
+        await handler(bot, call, *args)
+    return guarded
+
+def register_admin_routes(router, bot):
+    router.add_exact("admin_stock", admin_only(bot, handle_admin_stock))
+    router.add_prefix("admin_stock_", admin_only(bot, handle_admin_stock_platform))
@@ -0,0 +1,9 @@
+# handlers/aio/main_menu.py
+from handlers.main_menu import get_main_menu_keyboard, MAIN_MENU_TEXT
+
+async def send_main_menu(bot, message):
+    """
+    Sends the main menu to the user.
+    """
+    markup = get_main_menu_keyboard(message.from_user)
+    await bot.send_message(message.chat.id, MAIN_MENU_TEXT, parse_mode="HTML", reply_markup=markup)
@@ -0,0 +1,10 @@
+# handlers/aio/redeem.py
+from handlers.redeem import parse_redeem_keys, redeem_keys, REDEEM_USAGE_TEXT
+from handlers.aio import run_db
+
+async def handle_redeem_command(bot, message):
+    keys = parse_redeem_keys(message)
+    if keys is None:
+        await bot.reply_to(message, REDEEM_USAGE_TEXT)
+        return
+    await bot.reply_to(message, await run_db(redeem_keys, str(message.from_user.id), keys))
@@ -0,0 +1,12 @@
+# handlers/aio/referral.py
+from handlers.referral import complete_pending_referral, get_referral_menu_keyboard, REFERRAL_DONE_TEXT, REFERRAL_MENU_TEXT
+from handlers.aio import run_db
+from outbox import outbox
+
+async def process_verified_referral(bot, telegram_id):
+    referrer_id = await run_db(complete_pending_referral, telegram_id)
+    if referrer_id:
+        outbox.send_message(bot, referrer_id, REFERRAL_DONE_TEXT, parse_mode="HTML")
+
+async def send_referral_menu(bot, message):
+    await bot.send_message(message.chat.id, REFERRAL_MENU_TEXT, parse_mode="HTML", reply_markup=get_referral_menu_keyboard())
@@ -0,0 +1,24 @@
+# handlers/aio/review.py
+import config
+from cache import TTLCache
+from db import add_review
+from outbox import outbox
+from handlers.review import format_review, REVIEW_PROMPT_TEXT, REVIEW_THANKS_TEXT
+from handlers.aio import run_db
+
+# AsyncTeleBot has no next-step handlers, so remember who was asked for a review
+_awaiting_review = TTLCache(maxsize=10000, ttl=600)
+
+def is_awaiting_review(message):
+    return message.chat.id in _awaiting_review
+
+async def prompt_review(bot, message):
+    await bot.send_message(message.chat.id, REVIEW_PROMPT_TEXT, parse_mode="Markdown")
+    _awaiting_review.set(message.chat.id, True)
+
+async def process_review(bot, message):
+    _awaiting_review.pop(message.chat.id)
+    await run_db(add_review, str(message.from_user.id), message.text)
+    for owner in config.OWNERS:
+        outbox.send_message(bot, owner, format_review(message), parse_mode="Markdown")
+    await bot.send_message(message.chat.id, REVIEW_THANKS_TEXT, parse_mode="Markdown")
@@ -0,0 +1,38 @@
+# handlers/aio/rewards.py
+from db import claim_stock_item
+from handlers.rewards import (
+    build_rewards_page, build_platform_view, claim_replies,
+    CLAIM_COST, NO_PLATFORMS_TEXT,
+)
+from handlers.aio import run_db
+
+async def send_rewards_menu(bot, message):
+    """ Send the first page of the rewards menu to the user. """
+    text, markup = await run_db(build_rewards_page, 0)
+    if markup is None:
+        await bot.send_message(message.chat.id, NO_PLATFORMS_TEXT, parse_mode="HTML")
+        return
+    await bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=markup)
+
+async def handle_rewards_page(bot, call, page):
+    """ Show another page of the rewards menu in place. """
+    text, markup = await run_db(build_rewards_page, page)
+    await bot.answer_callback_query(call.id)
+    if markup is None:
+        await bot.edit_message_text(NO_PLATFORMS_TEXT, chat_id=call.message.chat.id, message_id=call.message.message_id, parse_mode="HTML")
+        return
+    await bot.edit_message_text(text, chat_id=call.message.chat.id, message_id=call.message.message_id, parse_mode="HTML", reply_markup=markup)
+
+async def handle_platform_selection(bot, call, platform):
+    """ Handle the platform selection to show available accounts. """
+    text, markup = await run_db(build_platform_view, platform)
+    await bot.edit_message_text(text, chat_id=call.message.chat.id, message_id=call.message.message_id, parse_mode="HTML", reply_markup=markup)
+
+async def claim_account(bot, call, platform):
+    """ Handle the account claiming system, deduct points, and update stock. """
+    user_id = str(call.from_user.id)
+    status, account, new_points = await run_db(claim_stock_item, user_id, platform, CLAIM_COST)
+    answer, text = claim_replies(status, platform, account, new_points)
+    await bot.answer_callback_query(call.id, answer)
+    if text:
+        await bot.send_message(call.message.chat.id, text, parse_mode="HTML")
@@ -0,0 +1,104 @@
+# handlers/aio/verification.py
+import asyncio
+import config
+from handlers import verification as sync_verification
+from handlers.verification import get_channel_username, get_join_channels_keyboard, MEMBERSHIP_CHECK_TIMEOUT
+from handlers.admin import is_admin
+from handlers.aio.main_menu import send_main_menu
+
+# The caches live in handlers.verification, so both runtimes share them
+
+async def init_verification(bot):
+    """
+    Fetches the bot's own user ID once at startup so membership checks never call getMe.
+    """
+    sync_verification._bot_id = (await bot.get_me()).id
+
+async def _get_channel_id(bot, channel_username):
+    chat_id = sync_verification._channel_ids.get(channel_username)
+    if chat_id is None:
+        chat_id = (await bot.get_chat("@" + channel_username)).id
+        sync_verification._channel_ids.set(channel_username, chat_id)
+    return chat_id
+
+async def _is_bot_admin(bot, chat_id):
+    if sync_verification._bot_admin.get(chat_id):
+        return True
+    if sync_verification._bot_id is None:
+        await init_verification(bot)
+    bot_member = await bot.get_chat_member(chat_id, sync_verification._bot_id)
+    if bot_member.status in ["administrator", "creator"]:
+        sync_verification._bot_admin.set(chat_id, True)
+        return True
+    return False
+
+async def _is_channel_member(bot, channel, user_id):
+    try:
+        chat_id = await _get_channel_id(bot, get_channel_username(channel))
+        if not await _is_bot_admin(bot, chat_id):
+            print(f"Bot is not admin in {channel}")
+            return False
+        user_member = await bot.get_chat_member(chat_id, user_id)
+        return user_member.status in ["member", "creator", "administrator"]
+    except Exception as e:
+        print(f"❌ Error checking membership for {channel}: {e}")
+        return False
+
+async def get_missing_channels(bot, user_id):
+    """
+    Returns the required channels the user could not be verified in (empty when verified).
+    Same contract as handlers.verification.get_missing_channels, with the checks running as
+    tasks on the event loop. Every task starts at once, so all of them run to completion (or
+    the deadline) and the list names every missing channel.
+    """
+    if sync_verification._verified_users.get(str(user_id)):
+        return []
+    tasks = {asyncio.create_task(_is_channel_member(bot, channel, user_id)): channel
+             for channel in config.REQUIRED_CHANNELS}
+    done, pending = await asyncio.wait(tasks, timeout=MEMBERSHIP_CHECK_TIMEOUT) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+    # Unanswered channels count as missing
+    missing = {tasks[task] for task in pending} | {tasks[task] for task in done if not task.result()}
+    if not missing:
+        sync_verification._verified_users.set(str(user_id), True)
+    return [channel for channel in config.REQUIRED_CHANNELS if channel in missing]
+
+async def send_verification_message(bot, message):
+    """
+    If the user is an admin/owner, auto‑verify.
+    Otherwise, send a message with channel join buttons and a Verify button.
+    """
+    user_id = message.from_user.id
+
+    if is_admin(user_id):
+        await bot.send_message(message.chat.id, "✨ Welcome, Admin/Owner! You are automatically verified! ✨")
+        await send_main_menu(bot, message)
+        return
+
+    missing = await get_missing_channels(bot, user_id)
+    if not missing:
+        await bot.send_message(message.chat.id, "✅ You are verified! 🎉")
+        await send_main_menu(bot, message)
+    else:
+        text = "🚫 You are not verified! Please join the following channels to use this bot:"
+        await bot.send_message(message.chat.id, text, reply_markup=get_join_channels_keyboard(missing))
+
+async def handle_verification_callback(bot, call):
+    """
+    When the user clicks the "✅ Verify" button, re-check channel membership.
+    """
+    user_id = call.from_user.id
+    missing = await get_missing_channels(bot, user_id)
+    if not missing:
+        await bot.answer_callback_query(call.id, "✅ Verification successful! 🎉")
+        await send_main_menu(bot, call.message)
+    else:
+        names = ", ".join("@" + get_channel_username(channel) for channel in missing)
+        await bot.answer_callback_query(call.id, f"🚫 Verification failed. Please join {names} and try again."[:200])
+        try:
+            await bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+                                                reply_markup=get_join_channels_keyboard(missing))
+        except Exception as e:
+            # Telegram rejects edits that leave the markup unchanged
+            print(f"Error updating verification buttons: {e}")
@@ -1,16 +1,24 @@
 # handlers/main_menu.py
 from telebot import types
 from handlers.admin import is_admin
+from keyboards import cached_keyboard
 
-def send_main_menu(bot, message):
+TUTORIAL_TEXT = (
+    "📖 <b>Tutorial</b>\n"
+    "1. Every new user starts with 20 points (each account claim costs 2 points).\n"
+    "2. To claim (buy) an account, go to the Rewards section. If you have at least 2 points, you can claim an account (2 points will be deducted).\n"
+    "3. Earn more points by referring friends or redeeming keys (/redeem <key> [key2 ...]).\n"
+    "4. Admins/Owners can generate keys using /gen and manage the bot from the Admin Panel.\n"
+    "Good luck! 😊"
+)
+
+MAIN_MENU_TEXT = "<b>📋 Main Menu 📋</b>\nPlease choose an option:"
+
+def build_main_menu_markup(user_obj):
     """
-    Sends the main menu to the user.
+    Builds the main menu keyboard.
     The "Admin Panel" button is always visible for admins, even after navigating to the admin panel.
     """
-    user_obj = message.from_user
-    telegram_id = str(user_obj.id)
-    
-    # Check if the user is an admin
     markup = types.InlineKeyboardMarkup(row_width=3)
     btn_rewards = types.InlineKeyboardButton("💳 Rewards", callback_data="menu_rewards")
     btn_account = types.InlineKeyboardButton("👤 Account Info", callback_data="menu_account")
@@ -22,16 +30,30 @@ def send_main_menu(bot, message):
     if is_admin(user_obj):
         btn_admin = types.InlineKeyboardButton("🛠 Admin Panel", callback_data="menu_admin")
         markup.add(btn_admin)
+    return markup
+
+def get_main_menu_keyboard(user_obj):
+    role = "admin" if is_admin(user_obj) else "user"
+    return cached_keyboard(("main_menu", role), build_main_menu_markup, user_obj)
+
+def build_back_to_main_markup():
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main"))
+    return markup
+
+def send_main_menu(bot, message):
+    """
+    Sends the main menu to the user.
+    """
+    markup = get_main_menu_keyboard(message.from_user)
 
     # Sending main menu with the options
-    bot.send_message(message.chat.id, "<b>📋 Main Menu 📋</b>\nPlease choose an option:", parse_mode="HTML", reply_markup=markup)
+    bot.send_message(message.chat.id, MAIN_MENU_TEXT, parse_mode="HTML", reply_markup=markup)
 
 def send_back_to_main_menu(bot, message):
     """
     Sends the back button to go back to the main menu
     """
-    markup = types.InlineKeyboardMarkup()
-    back_button = types.InlineKeyboardButton("🔙 Back to Main Menu", callback_data="back_main")
-    markup.add(back_button)
+    markup = cached_keyboard(("back_main",), build_back_to_main_markup)
     bot.send_message(message.chat.id, "Returning to main menu...", reply_markup=markup)
     
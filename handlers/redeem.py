@@ -0,0 +1,85 @@
+# handlers/redeem.py
+import math
+import config
+from db import claim_keys_in_db, is_unclaimed_key, REDEEM_OK, REDEEM_NOT_FOUND, REDEEM_ALREADY_CLAIMED
+from ratelimit import SlidingWindowCounter
+
+# Most keys accepted in one /redeem message
+REDEEM_MAX_KEYS = 20
+REDEEM_USAGE_TEXT = f"Usage: /redeem <key> [key2 ...] (up to {REDEEM_MAX_KEYS} keys)"
+
+# Failed keys a user may try within REDEEM_FAIL_WINDOW seconds before /redeem is refused
+REDEEM_FAIL_LIMIT = getattr(config, "REDEEM_FAIL_LIMIT", 5)
+REDEEM_FAIL_WINDOW = getattr(config, "REDEEM_FAIL_WINDOW", 600)
+REDEEM_THROTTLED_TEXT = "🚫 Too many invalid keys. Please try again in {minutes} minute(s)."
+
+# Status for keys rejected by the in-memory filter: never issued, or already redeemed
+REDEEM_UNKNOWN = "unknown"
+
+_failed_redeems = SlidingWindowCounter(REDEEM_FAIL_LIMIT, REDEEM_FAIL_WINDOW)
+
+def parse_redeem_keys(message):
+    """
+    Returns the distinct keys after /redeem, in order, or None when there are none or too many.
+    """
+    keys = list(dict.fromkeys(part.strip() for part in message.text.split()[1:] if part.strip()))
+    if not keys or len(keys) > REDEEM_MAX_KEYS:
+        return None
+    return keys
+
+def format_redeem_result(status, points):
+    if status == REDEEM_OK:
+        return f"Key redeemed successfully. You've been awarded {points} points."
+    if status == REDEEM_ALREADY_CLAIMED:
+        return "Key already claimed."
+    if status == REDEEM_NOT_FOUND:
+        return "Key not found."
+    return "Key not found or already claimed."
+
+def format_redeem_results(results):
+    lines = []
+    for key, status, points in results:
+        if status == REDEEM_OK:
+            lines.append(f"✅ {key}: +{points} points")
+        elif status == REDEEM_ALREADY_CLAIMED:
+            lines.append(f"⚠️ {key}: already claimed")
+        elif status == REDEEM_NOT_FOUND:
+            lines.append(f"❌ {key}: not found")
+        else:
+            lines.append(f"❌ {key}: not found or already claimed")
+    total = sum(points for _, status, points in results if status == REDEEM_OK)
+    lines.append(f"\nTotal awarded: {total} points.")
+    return "\n".join(lines)
+
+def redeem_keys(user_id, keys):
+    """
+    Redeems the keys in one transaction and returns the reply text. Keys the in-memory filter
+    knows are not redeemable are answered without a query, and users who keep sending bad
+    keys are refused for a while.
+    """
+    wait = _failed_redeems.retry_after(user_id)
+    if wait:
+        return REDEEM_THROTTLED_TEXT.format(minutes=math.ceil(wait / 60))
+
+    results = {key: (key, REDEEM_UNKNOWN, 0) for key in keys}
+    candidates = [key for key in keys if is_unclaimed_key(key)]
+    if candidates:
+        for result in claim_keys_in_db(candidates, user_id):
+            results[result[0]] = result
+    results = [results[key] for key in keys]
+
+    failures = sum(1 for _, status, _ in results if status != REDEEM_OK)
+    if failures:
+        _failed_redeems.add(user_id, failures)
+
+    if len(results) == 1:
+        _, status, points = results[0]
+        return format_redeem_result(status, points)
+    return format_redeem_results(results)
+
+def handle_redeem_command(bot, message):
+    keys = parse_redeem_keys(message)
+    if keys is None:
+        bot.reply_to(message, REDEEM_USAGE_TEXT)
+        return
+    bot.reply_to(message, redeem_keys(str(message.from_user.id), keys))
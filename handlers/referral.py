@@ -1,6 +1,8 @@
 # handlers/referral.py
 import telebot
 import config
+from outbox import outbox
+from keyboards import cached_keyboard
 from db import get_user, clear_pending_referral, add_referral
 
 def extract_referral_code(message):
@@ -10,26 +12,37 @@ def extract_referral_code(message):
                 return part[len("ref_"):]
     return None
 
-def process_verified_referral(telegram_id):
+REFERRAL_DONE_TEXT = "<b>🎉 Referral completed!</b> You earned 4 points."
+REFERRAL_MENU_TEXT = "🔗 <b>Referral System 😁</b>\nYour referral link is below."
+
+def complete_pending_referral(telegram_id):
+    """
+    Credits the referrer stored on a newly verified user. Returns the referrer's ID, or None.
+    """
     referred = get_user(str(telegram_id))
-    # pending_referrer is stored in column index 6
-    if referred and referred[6]:
-        referrer_id = referred[6]
-        add_referral(referrer_id, referred[0])
+    if referred and referred.pending_referrer:
+        referrer_id = referred.pending_referrer
+        add_referral(referrer_id, referred.telegram_id)
         clear_pending_referral(str(telegram_id))
-        bot = telebot.TeleBot(config.TOKEN)
-        try:
-            bot.send_message(referrer_id, "<b>🎉 Referral completed!</b> You earned 4 points.", parse_mode="HTML")
-        except Exception as e:
-            print(f"Error notifying referrer: {e}")
+        return referrer_id
+    return None
 
-def send_referral_menu(bot, message):
-    telegram_id = str(message.from_user.id)
-    text = "🔗 <b>Referral System 😁</b>\nYour referral link is below."
+def process_verified_referral(bot, telegram_id):
+    referrer_id = complete_pending_referral(telegram_id)
+    if referrer_id:
+        outbox.send_message(bot, referrer_id, REFERRAL_DONE_TEXT, parse_mode="HTML")
+
+def build_referral_menu_markup():
     markup = telebot.types.InlineKeyboardMarkup()
     markup.add(telebot.types.InlineKeyboardButton("🌟 Get Referral Link", callback_data="get_ref_link"))
     markup.add(telebot.types.InlineKeyboardButton("🔙 Back", callback_data="back_main"))
-    bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=markup)
+    return markup
+
+def get_referral_menu_keyboard():
+    return cached_keyboard(("referral_menu",), build_referral_menu_markup)
+
+def send_referral_menu(bot, message):
+    bot.send_message(message.chat.id, REFERRAL_MENU_TEXT, parse_mode="HTML", reply_markup=get_referral_menu_keyboard())
 
 def get_referral_link(telegram_id):
     return f"https://t.me/{config.BOT_USERNAME}?start=ref_{telegram_id}"
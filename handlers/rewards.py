@@ -1,70 +1,93 @@
 # handlers/rewards.py
 import telebot
 from telebot import types
-import sqlite3
-import json
-import random
-from db import DATABASE, update_user_points, get_user
-
-def get_db_connection():
-    return sqlite3.connect(DATABASE)
-
-def get_platforms():
-    """ Fetch all available platforms from the database. """
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT platform_name FROM platforms")
-    platforms = [row[0] for row in c.fetchall()]
-    conn.close()
-    return platforms
-
-def get_stock_for_platform(platform_name):
-    """ Get the stock of accounts for a given platform. """
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT stock FROM platforms WHERE platform_name=?", (platform_name,))
-    row = c.fetchone()
-    conn.close()
-    if row and row[0]:
-        try:
-            return json.loads(row[0])  # Return as a list of accounts
-        except Exception:
-            return []
-    return []
-
-def update_stock_for_platform(platform_name, stock):
-    """ Update the stock of accounts for a given platform. """
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("UPDATE platforms SET stock=? WHERE platform_name=?", (json.dumps(stock), platform_name))
-    conn.commit()
-    conn.close()
+import config
+from keyboards import cached_keyboard
+from db import (
+    get_platforms, get_platforms_version, get_stock_count, claim_stock_item,
+    CLAIM_NO_USER, CLAIM_INSUFFICIENT_POINTS, CLAIM_OUT_OF_STOCK,
+)
 
-def send_rewards_menu(bot, message):
-    """ Send the rewards menu to the user. """
-    platforms = get_platforms()
-    markup = types.InlineKeyboardMarkup(row_width=2)
+# Points spent on each claimed account
+CLAIM_COST = 2
 
-    # Check if there are platforms available
+# Platforms shown per page of the rewards menu
+REWARDS_PAGE_SIZE = getattr(config, "REWARDS_PAGE_SIZE", 10)
+
+NO_PLATFORMS_TEXT = "😢 <b>No platforms available at the moment.</b>"
+REWARDS_MENU_TEXT = "<b>🎯 Available Platforms 🎯</b>"
+REWARDS_PAGE_TEXT = "<b>🎯 Available Platforms 🎯</b>\nPage {page} of {pages}"
+
+REWARDS_PAGE_PREFIX = "rewards_page_"
+
+def parse_rewards_page(page):
+    """ The page number <n> of a rewards_page_<n> callback, or 0 if it is malformed. """
+    return int(page) if page.isdigit() else 0
+
+def get_rewards_page_count():
+    return -(-len(get_platforms()) // REWARDS_PAGE_SIZE)
+
+def build_rewards_menu(page=0):
+    """ Build the markup for one page of the rewards menu, or None when there are no platforms. """
+    platforms = get_platforms()
     if not platforms:
-        bot.send_message(message.chat.id, "😢 <b>No platforms available at the moment.</b>", parse_mode="HTML")
-        return
+        return None
+    markup = types.InlineKeyboardMarkup(row_width=2)
 
-    # Add buttons for each platform
-    for platform in platforms:
+    # Add buttons for each platform on this page
+    for platform in platforms[page * REWARDS_PAGE_SIZE:(page + 1) * REWARDS_PAGE_SIZE]:
         markup.add(types.InlineKeyboardButton(f"📺 {platform}", callback_data=f"reward_{platform}"))
-    
+
+    # Prev/next buttons when the platforms do not fit on one page
+    nav = []
+    if page > 0:
+        nav.append(types.InlineKeyboardButton("⬅️ Prev", callback_data=f"{REWARDS_PAGE_PREFIX}{page - 1}"))
+    if (page + 1) * REWARDS_PAGE_SIZE < len(platforms):
+        nav.append(types.InlineKeyboardButton("Next ➡️", callback_data=f"{REWARDS_PAGE_PREFIX}{page + 1}"))
+    if nav:
+        markup.add(*nav)
+
     # Add a back button to main menu
     markup.add(types.InlineKeyboardButton("🔙 Back", callback_data="back_main"))
+    return markup
+
+def build_rewards_page(page=0):
+    """
+    Build (text, reply_markup JSON) for a rewards menu page, clamped to the pages that exist.
+    The markup is None when there are no platforms. Pages are rebuilt only when the platform list changes.
+    """
+    pages = get_rewards_page_count()
+    page = max(0, min(page, pages - 1))
+    markup = cached_keyboard(("rewards", get_platforms_version(), page), build_rewards_menu, page)
+    text = REWARDS_PAGE_TEXT.format(page=page + 1, pages=pages) if pages > 1 else REWARDS_MENU_TEXT
+    return text, markup
+
+def send_rewards_menu(bot, message):
+    """ Send the first page of the rewards menu to the user. """
+    text, markup = build_rewards_page(0)
 
-    bot.send_message(message.chat.id, "<b>🎯 Available Platforms 🎯</b>", parse_mode="HTML", reply_markup=markup)
+    # Check if there are platforms available
+    if markup is None:
+        bot.send_message(message.chat.id, NO_PLATFORMS_TEXT, parse_mode="HTML")
+        return
 
-def handle_platform_selection(bot, call, platform):
-    """ Handle the platform selection to show available accounts. """
-    stock = get_stock_for_platform(platform)
+    bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=markup)
 
-    if stock:
-        text = f"<b>📺 {platform}</b>:\n✅ <b>{len(stock)} accounts available!</b>"
+def handle_rewards_page(bot, call, page):
+    """ Show another page of the rewards menu in place. """
+    text, markup = build_rewards_page(page)
+    bot.answer_callback_query(call.id)
+    if markup is None:
+        bot.edit_message_text(NO_PLATFORMS_TEXT, chat_id=call.message.chat.id, message_id=call.message.message_id, parse_mode="HTML")
+        return
+    bot.edit_message_text(text, chat_id=call.message.chat.id, message_id=call.message.message_id, parse_mode="HTML", reply_markup=markup)
+
+def build_platform_view(platform):
+    """ Build the (text, markup) shown for a platform's stock. """
+    count = get_stock_count(platform)
+
+    if count:
+        text = f"<b>📺 {platform}</b>:\n✅ <b>{count} accounts available!</b>"
         markup = types.InlineKeyboardMarkup(row_width=1)
         markup.add(types.InlineKeyboardButton("🎁 Claim Account", callback_data=f"claim_{platform}"))
     else:
@@ -73,52 +96,35 @@ def handle_platform_selection(bot, call, platform):
     
     # Add a back button to rewards menu
     markup.add(types.InlineKeyboardButton("🔙 Back", callback_data="menu_rewards"))
-    
+    return text, markup
+
+def handle_platform_selection(bot, call, platform):
+    """ Handle the platform selection to show available accounts. """
+    text, markup = build_platform_view(platform)
     bot.edit_message_text(text, chat_id=call.message.chat.id, message_id=call.message.message_id, parse_mode="HTML", reply_markup=markup)
 
+def claim_replies(status, platform, account, new_points):
+    """ Map a claim result to (callback answer, chat message or None). """
+    if status == CLAIM_NO_USER:
+        return "User not found.", None
+    if status == CLAIM_INSUFFICIENT_POINTS:
+        return f"Insufficient points (each account costs {CLAIM_COST} points). Earn more by referring or redeeming a key.", None
+    if status == CLAIM_OUT_OF_STOCK:
+        return "😞 No accounts available.", None
+    return "🎉 Account claimed!", f"<b>Your account for {platform}:</b>\n<code>{account}</code>\nRemaining points: {new_points}"
+
 def claim_account(bot, call, platform):
     """ Handle the account claiming system, deduct points, and update stock. """
     user_id = str(call.from_user.id)
-    user = get_user(user_id)
-
-    if user is None:
-        bot.answer_callback_query(call.id, "User not found.")
-        return
-
-    # Get current points of the user
-    try:
-        current_points = int(float(user[4]))  # Points are stored as integer or float
-    except Exception:
-        bot.answer_callback_query(call.id, "Error reading your points.")
-        return
-
-    # Check if user has enough points to claim an account
-    if current_points < 2:
-        bot.answer_callback_query(call.id, "Insufficient points (each account costs 2 points). Earn more by referring or redeeming a key.")
-        return
 
-    # Get the stock for the platform
-    stock = get_stock_for_platform(platform)
-    if not stock:
-        bot.answer_callback_query(call.id, "😞 No accounts available.")
-        return
-
-    # Randomly select an account from the available stock
-    account = stock.pop(random.randint(0, len(stock) - 1))
-
-    # Deduct points from the user's balance
-    new_points = current_points - 2
-    update_user_points(user_id, new_points)
-
-    # Update the stock for the platform
-    update_stock_for_platform(platform, stock)
+    # Debit the points, take the account and record the claim in one transaction
+    status, account, new_points = claim_stock_item(user_id, platform, CLAIM_COST)
+    answer, text = claim_replies(status, platform, account, new_points)
 
     # Inform the user and send the account details
-    bot.answer_callback_query(call.id, "🎉 Account claimed!")
-    bot.send_message(call.message.chat.id,
-                     f"<b>Your account for {platform}:</b>\n<code>{account}</code>\nRemaining points: {new_points}",
-                     parse_mode="HTML")
+    bot.answer_callback_query(call.id, answer)
+    if text:
+        bot.send_message(call.message.chat.id, text, parse_mode="HTML")
 
     # Optionally, notify admins about the claim (this can be added in the future)
-    # bot.send_message(admin_id, f"User {user[2]} has claimed an account for {platform}.")
-    
+    # bot.send_message(admin_id, f"User {user_id} has claimed an account for {platform}.")
@@ -1,31 +1,129 @@
 # handlers/verification.py
 import telebot
 from telebot import types
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import config
+from cache import TTLCache
+from keyboards import cached_keyboard
 from handlers.admin import is_admin
 
+MEMBERSHIP_CACHE_TTL = getattr(config, "MEMBERSHIP_CACHE_TTL", 600)
+MEMBERSHIP_CACHE_SIZE = getattr(config, "MEMBERSHIP_CACHE_SIZE", 100000)
+BOT_ADMIN_CACHE_TTL = getattr(config, "BOT_ADMIN_CACHE_TTL", 600)
+MEMBERSHIP_CHECK_TIMEOUT = getattr(config, "MEMBERSHIP_CHECK_TIMEOUT", 5)
+MEMBERSHIP_CHECK_WORKERS = getattr(config, "MEMBERSHIP_CHECK_WORKERS", 16)
+
+# Shared pool that checks the required channels of one user in parallel
+_membership_pool = ThreadPoolExecutor(max_workers=MEMBERSHIP_CHECK_WORKERS, thread_name_prefix="membership")
+
+# channel username -> chat id; usernames are resolved once per process
+_channel_ids = TTLCache(maxsize=1024)
+# chat id -> True while the bot is known to be admin there
+_bot_admin = TTLCache(maxsize=1024, ttl=BOT_ADMIN_CACHE_TTL)
+# user id -> True for users recently found to be in every required channel
+_verified_users = TTLCache(maxsize=MEMBERSHIP_CACHE_SIZE, ttl=MEMBERSHIP_CACHE_TTL)
+_bot_id = None
+
+def init_verification(bot):
+    """
+    Fetches the bot's own user ID once at startup so membership checks never call getMe.
+    """
+    global _bot_id
+    _bot_id = bot.get_me().id
+
+def get_channel_username(channel):
+    return channel.rstrip('/').split("/")[-1]
+
+def _get_channel_id(bot, channel_username):
+    chat_id = _channel_ids.get(channel_username)
+    if chat_id is None:
+        chat_id = bot.get_chat("@" + channel_username).id
+        _channel_ids.set(channel_username, chat_id)
+    return chat_id
+
+def _is_bot_admin(bot, chat_id):
+    if _bot_admin.get(chat_id):
+        return True
+    if _bot_id is None:
+        init_verification(bot)
+    bot_member = bot.get_chat_member(chat_id, _bot_id)
+    if bot_member.status in ["administrator", "creator"]:
+        _bot_admin.set(chat_id, True)
+        return True
+    return False
+
+def _is_channel_member(bot, channel, user_id):
+    """
+    Returns True if the bot is admin in the channel and the user is a member of it.
+    """
+    try:
+        chat_id = _get_channel_id(bot, get_channel_username(channel))
+        # Check bot privileges in channel
+        if not _is_bot_admin(bot, chat_id):
+            print(f"Bot is not admin in {channel}")
+            return False
+        user_member = bot.get_chat_member(chat_id, user_id)
+        return user_member.status in ["member", "creator", "administrator"]
+    except Exception as e:
+        print(f"❌ Error checking membership for {channel}: {e}")
+        return False
+
+def get_missing_channels(bot, user_id):
+    """
+    Returns the required channels the user could not be verified in (empty when verified).
+    All channels are checked in parallel. Once one check fails, checks still queued in the pool
+    are cancelled and count as missing, while checks already running finish so the list names
+    every channel they found missing. Channels still unanswered after MEMBERSHIP_CHECK_TIMEOUT
+    seconds count as missing.
+    Positive results are cached for MEMBERSHIP_CACHE_TTL seconds, and channel IDs and the
+    bot's admin status are cached too, so a recently verified user costs no API calls.
+    """
+    if _verified_users.get(str(user_id)):
+        return []
+    futures = {_membership_pool.submit(_is_channel_member, bot, channel, user_id): channel
+               for channel in config.REQUIRED_CHANNELS}
+    missing = set()
+    pending = set(futures)
+    deadline = time.monotonic() + MEMBERSHIP_CHECK_TIMEOUT
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.cancelled() or not future.result():
+                missing.add(futures[future])
+        if missing:
+            # cancel() only succeeds for checks that have not started
+            for future in pending:
+                future.cancel()
+    # Timed out waiting on the remaining channels
+    missing.update(futures[future] for future in pending)
+    for future in pending:
+        future.cancel()
+    if not missing:
+        _verified_users.set(str(user_id), True)
+    return [channel for channel in config.REQUIRED_CHANNELS if channel in missing]
+
 def check_channel_membership(bot, user_id):
     """
     Checks if the user is a member of all required channels.
-    For each channel, first verify that the bot is an administrator.
-    Returns True only if the bot is admin in the channel and the user is a member.
     """
-    for channel in config.REQUIRED_CHANNELS:
-        try:
-            channel_username = channel.rstrip('/').split("/")[-1]
-            chat = bot.get_chat("@" + channel_username)
-            # Check bot privileges in channel
-            bot_member = bot.get_chat_member(chat.id, bot.get_me().id)
-            if bot_member.status not in ["administrator", "creator"]:
-                print(f"Bot is not admin in {channel}")
-                return False
-            user_member = bot.get_chat_member(chat.id, user_id)
-            if user_member.status not in ["member", "creator", "administrator"]:
-                return False
-        except Exception as e:
-            print(f"❌ Error checking membership for {channel}: {e}")
-            return False
-    return True
+    return not get_missing_channels(bot, user_id)
+
+def build_join_channels_markup(channels):
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    for channel in channels:
+        channel_username = get_channel_username(channel)
+        markup.add(types.InlineKeyboardButton(text=f"👉 {channel_username}", url=channel))
+    markup.add(types.InlineKeyboardButton("✅ Verify", callback_data="verify"))
+    return markup
+
+def get_join_channels_keyboard(channels):
+    """
+    Keyed by the channels themselves, so a changed channel list simply makes new entries.
+    """
+    return cached_keyboard(("join_channels", tuple(channels)), build_join_channels_markup, channels)
 
 def send_verification_message(bot, message):
     """
@@ -40,29 +138,31 @@ def send_verification_message(bot, message):
         send_main_menu(bot, message)
         return
 
-    if check_channel_membership(bot, user_id):
+    missing = get_missing_channels(bot, user_id)
+    if not missing:
         bot.send_message(message.chat.id, "✅ You are verified! 🎉")
         from handlers.main_menu import send_main_menu
         send_main_menu(bot, message)
     else:
         text = "🚫 You are not verified! Please join the following channels to use this bot:"
-        markup = types.InlineKeyboardMarkup(row_width=2)
-        for channel in config.REQUIRED_CHANNELS:
-            channel_username = channel.rstrip('/').split("/")[-1]
-            btn = types.InlineKeyboardButton(text=f"👉 {channel_username}", url=channel)
-            markup.add(btn)
-        markup.add(types.InlineKeyboardButton("✅ Verify", callback_data="verify"))
-        bot.send_message(message.chat.id, text, reply_markup=markup)
+        bot.send_message(message.chat.id, text, reply_markup=get_join_channels_keyboard(missing))
 
 def handle_verification_callback(bot, call):
     """
     When the user clicks the "✅ Verify" button, re-check channel membership.
     """
     user_id = call.from_user.id
-    if check_channel_membership(bot, user_id):
+    missing = get_missing_channels(bot, user_id)
+    if not missing:
         bot.answer_callback_query(call.id, "✅ Verification successful! 🎉")
         from handlers.main_menu import send_main_menu
         send_main_menu(bot, call.message)
     else:
-        bot.answer_callback_query(call.id, "🚫 Verification failed. Please join all channels and try again.")
-        
+        names = ", ".join("@" + get_channel_username(channel) for channel in missing)
+        bot.answer_callback_query(call.id, f"🚫 Verification failed. Please join {names} and try again."[:200])
+        try:
+            bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+                                          reply_markup=get_join_channels_keyboard(missing))
+        except Exception as e:
+            # Telegram rejects edits that leave the markup unchanged
+            print(f"Error updating verification buttons: {e}")
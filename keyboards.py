@@ -0,0 +1,26 @@
+# keyboards.py
+from cache import TTLCache
+
+# Serialized keyboards by key, e.g. ("main_menu", "admin") or ("rewards", platforms_version).
+# Keys carry whatever the keyboard depends on, so a change produces a new key rather than
+# needing an invalidation; stale entries age out of the LRU.
+_keyboards = TTLCache(maxsize=1024)
+
+# Cached for builders that return None (e.g. no platforms), so they are not rebuilt either
+_NO_KEYBOARD = ""
+
+def cached_keyboard(key, build, *args):
+    """
+    Returns the reply_markup JSON for build(*args), building and serializing it only the first
+    time `key` is seen. The Bot API wrappers pass strings through unchanged. Returns None when
+    build returns None.
+    """
+    payload = _keyboards.get(key)
+    if payload is None:
+        markup = build(*args)
+        payload = _NO_KEYBOARD if markup is None else markup.to_json()
+        _keyboards.set(key, payload)
+    return payload or None
+
+def clear_keyboards():
+    _keyboards.clear()
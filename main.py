@@ -1,20 +1,34 @@
 # main.py
-import telebot
 import config
+from client import create_bot
 from datetime import datetime
-from db import init_db, add_user, get_user, claim_key_in_db
-from handlers.verification import send_verification_message, handle_verification_callback
-from handlers.main_menu import send_main_menu, send_back_to_main_menu
+from router import CallbackRouter
+from middleware import RateLimitMiddleware
+from metrics import timed, start_metrics_server
+from db import init_db, add_user, get_user, unblock_user, load_unclaimed_keys, load_authorization
+from broadcast import resume_broadcasts
+from handlers.verification import init_verification, send_verification_message, handle_verification_callback
+from handlers.main_menu import send_main_menu, send_back_to_main_menu, TUTORIAL_TEXT
 from handlers.referral import extract_referral_code, process_verified_referral, send_referral_menu, get_referral_link
-from handlers.rewards import send_rewards_menu, handle_platform_selection, claim_account
+from handlers.rewards import send_rewards_menu, handle_rewards_page, parse_rewards_page, handle_platform_selection, claim_account, REWARDS_PAGE_PREFIX
 from handlers.account_info import send_account_info
 from handlers.review import prompt_review
-from handlers.admin import send_admin_menu, admin_callback_handler, is_admin, generate_normal_key, generate_premium_key, add_key, log_admin_action
+from handlers.redeem import handle_redeem_command
+from handlers.admin import send_admin_menu, register_admin_routes, handle_stats_command, is_admin, generate_keys, send_keys, queue_keys, log_admin_action, handle_broadcast_command, GEN_MAX_KEYS
 
-bot = telebot.TeleBot(config.TOKEN, parse_mode="HTML")
+RUN_MODE = getattr(config, "RUN_MODE", "polling")
+
+# In webhook mode the webhook worker pool runs handlers, so the bot must not spawn its own threads
+bot = create_bot(threaded=RUN_MODE != "webhook", use_class_middlewares=True)
 init_db()
+load_unclaimed_keys()
+load_authorization()
+init_verification(bot)
+router = CallbackRouter(bot)
+bot.setup_middleware(RateLimitMiddleware(bot, router))
 
 @bot.message_handler(commands=["start"])
+@timed("handler")
 def start_command(message):
     user_id = str(message.from_user.id)
     pending_ref = extract_referral_code(message)
@@ -26,11 +40,15 @@ def start_command(message):
                  message.from_user.username or message.from_user.first_name,
                  datetime.now().strftime("%Y-%m-%d"),
                  pending_referrer=pending_ref)
+    elif user.blocked:
+        # A user who blocked the bot and came back gets broadcasts again
+        unblock_user(user_id)
     
     # Send verification message
     send_verification_message(bot, message)
 
 @bot.message_handler(commands=["gen"])
+@timed("handler")
 def gen_command(message):
     user_id = str(message.from_user.id)
     
@@ -53,110 +71,105 @@ def gen_command(message):
     except ValueError:
         bot.reply_to(message, "Quantity must be a number.")
         return
-    
-    generated = []
+    if not 0 < qty <= GEN_MAX_KEYS:
+        bot.reply_to(message, f"Quantity must be between 1 and {GEN_MAX_KEYS}.")
+        return
     
     # Generate normal or premium keys as per the command
-    if key_type == "normal":
-        for _ in range(qty):
-            key = generate_normal_key()
-            add_key(key, "normal", 15)
-            generated.append(key)
-    elif key_type == "premium":
-        for _ in range(qty):
-            key = generate_premium_key()
-            add_key(key, "premium", 35)
-            generated.append(key)
-    else:
+    generated = generate_keys(key_type, qty)
+    if generated is None:
         bot.reply_to(message, "Key type must be either 'normal' or 'premium'.")
         return
 
     # Notify the user of the generated keys
-    bot.reply_to(message, "Generated keys:\n" + "\n".join(generated))
+    send_keys(bot, message.chat.id, "Generated keys:", generated, key_type, reply_to_message_id=message.message_id)
 
     # Log the admin action and notify owners
     action = f"Generated {len(generated)} {key_type} keys"
     log_admin_action(user_id, action)
-
-    bot = telebot.TeleBot(config.TOKEN)
     for owner in config.OWNERS:
-        bot.send_message(owner, f"Admin {message.from_user.username} has generated keys: \n" + "\n".join(generated))
+        queue_keys(bot, owner, f"Admin {message.from_user.username} has generated keys:", generated, key_type)
 
 @bot.message_handler(commands=["redeem"])
+@timed("handler")
 def redeem_command(message):
-    user_id = str(message.from_user.id)
-    parts = message.text.split()
-    
-    # Ensure correct usage of the /redeem command
-    if len(parts) < 2:
-        bot.reply_to(message, "Usage: /redeem <key>")
-        return
-    
-    key = parts[1].strip()
-    
-    # Redeem the key and provide feedback
-    result = claim_key_in_db(key, user_id)
-    bot.reply_to(message, result)
+    # One or more keys, redeemed together in a single transaction
+    handle_redeem_command(bot, message)
+
+@bot.message_handler(commands=["broadcast"])
+@timed("handler")
+def broadcast_command(message):
+    handle_broadcast_command(bot, message)
+
+@bot.message_handler(commands=["stats"])
+@timed("handler")
+def stats_command(message):
+    handle_stats_command(bot, message)
 
 @bot.message_handler(commands=["tutorial"])
+@timed("handler")
 def tutorial_command(message):
-    text = (
-        "📖 <b>Tutorial</b>\n"
-        "1. Every new user starts with 20 points (each account claim costs 2 points).\n"
-        "2. To claim (buy) an account, go to the Rewards section. If you have at least 2 points, you can claim an account (2 points will be deducted).\n"
-        "3. Earn more points by referring friends or redeeming keys (/redeem <key>).\n"
-        "4. Admins/Owners can generate keys using /gen and manage the bot from the Admin Panel.\n"
-        "Good luck! 😊"
-    )
-    bot.send_message(message.chat.id, text, parse_mode="HTML")
-
-@bot.callback_query_handler(func=lambda call: call.data == "back_main")
+    bot.send_message(message.chat.id, TUTORIAL_TEXT, parse_mode="HTML")
+
+@router.exact("back_main")
 def callback_back_main(call):
     send_main_menu(bot, call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data == "get_ref_link")
+@router.exact("get_ref_link")
 def callback_get_ref_link(call):
     ref_link = get_referral_link(call.from_user.id)
     bot.answer_callback_query(call.id, "Referral link generated!")
     bot.send_message(call.message.chat.id, f"Your referral link:\n{ref_link}", parse_mode="HTML")
 
-@bot.callback_query_handler(func=lambda call: call.data == "menu_rewards")
+@router.exact("menu_rewards")
 def callback_menu_rewards(call):
     send_rewards_menu(bot, call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("reward_"))
-def callback_reward(call):
-    platform = call.data.split("reward_")[1]
+@router.prefix(REWARDS_PAGE_PREFIX)
+def callback_rewards_page(call, page):
+    handle_rewards_page(bot, call, parse_rewards_page(page))
+
+@router.prefix("reward_")
+def callback_reward(call, platform):
     handle_platform_selection(bot, call, platform)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("claim_"))
-def callback_claim(call):
-    platform = call.data.split("claim_")[1]
+@router.prefix("claim_")
+def callback_claim(call, platform):
     claim_account(bot, call, platform)
 
-@bot.callback_query_handler(func=lambda call: call.data == "menu_account")
+@router.exact("menu_account")
 def callback_menu_account(call):
     send_account_info(bot, call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data == "menu_referral")
+@router.exact("menu_referral")
 def callback_menu_referral(call):
     send_referral_menu(bot, call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data == "menu_review")
+@router.exact("menu_review")
 def callback_menu_review(call):
     prompt_review(bot, call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data == "menu_admin")
+@router.exact("menu_admin")
 def callback_menu_admin(call):
     send_admin_menu(bot, call.message)
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("admin"))
-def callback_admin(call):
-    admin_callback_handler(bot, call)
-
-@bot.callback_query_handler(func=lambda call: call.data == "verify")
+@router.exact("verify")
 def callback_verify(call):
     handle_verification_callback(bot, call)
-    process_verified_referral(call.from_user.id)
+    process_verified_referral(bot, call.from_user.id)
+
+register_admin_routes(router, bot)
 
-bot.polling(none_stop=True)
+# Every callback query goes through the router, which looks its handler up by callback_data
+@bot.callback_query_handler(func=lambda call: True)
+def callback_entry(call):
+    router.dispatch(call)
+
+if __name__ == '__main__':
+    start_metrics_server()
+    resume_broadcasts(bot)
+    if RUN_MODE == "webhook":
+        from webhook import run_webhook
+        run_webhook(bot)
+    else:
+        bot.polling(none_stop=True)
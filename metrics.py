@@ -0,0 +1,193 @@
+# metrics.py
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import config
+
+METRICS_LISTEN = getattr(config, "METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = getattr(config, "METRICS_PORT", None)
+
+# Latency histogram bucket bounds, in seconds
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Series:
+    __slots__ = ("count", "errors", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile (0..1) by interpolating inside the bucket it falls in.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if seen + n >= rank and n:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+class Metrics:
+    """
+    Call counts, error counts and latency histograms keyed by (kind, name), e.g.
+    ("handler", "start_command"), ("bot_api", "sendMessage") or ("db", "get_user").
+    Recording is one bisect and a few increments under a lock.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind, name, seconds, error=False):
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = Series()
+            series.count += 1
+            series.total += seconds
+            series.buckets[bucket] += 1
+            if error:
+                series.errors += 1
+
+    def snapshot(self):
+        """
+        Returns {(kind, name): Series} copies, safe to read while recording continues.
+        """
+        with self._lock:
+            copies = {}
+            for key, series in self._series.items():
+                copy = Series()
+                copy.count, copy.errors, copy.total = series.count, series.errors, series.total
+                copy.buckets = list(series.buckets)
+                copies[key] = copy
+            return copies
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def to_prometheus(self):
+        series_by_labels = [(f'kind="{kind}",name="{_escape(name)}"', series)
+                            for (kind, name), series in sorted(self.snapshot().items(), key=lambda item: str(item[0]))]
+        lines = ["# TYPE bot_calls_total counter"]
+        lines.extend(f"bot_calls_total{{{labels}}} {series.count}" for labels, series in series_by_labels)
+        lines.append("# TYPE bot_errors_total counter")
+        lines.extend(f"bot_errors_total{{{labels}}} {series.errors}" for labels, series in series_by_labels)
+        lines.append("# TYPE bot_latency_seconds histogram")
+        for labels, series in series_by_labels:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, series.buckets):
+                cumulative += n
+                lines.append(f'bot_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'bot_latency_seconds_bucket{{{labels},le="+Inf"}} {series.count}')
+            lines.append(f"bot_latency_seconds_sum{{{labels}}} {series.total:.6f}")
+            lines.append(f"bot_latency_seconds_count{{{labels}}} {series.count}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Shared instance recording everything in the process
+metrics = Metrics()
+
+def timed(kind, name=None):
+    """
+    Decorator recording each call of the function (sync or coroutine) under (kind, name);
+    name defaults to the function's name. Exceptions count as errors and are re-raised.
+    """
+    def decorator(func):
+        label = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = True
+                try:
+                    result = await func(*args, **kwargs)
+                    error = False
+                    return result
+                finally:
+                    metrics.observe(kind, label, time.perf_counter() - started, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                metrics.observe(kind, label, time.perf_counter() - started, error)
+        return wrapper
+    return decorator
+
+def instrument_module(namespace, kind, exclude=()):
+    """
+    Wraps every public function defined in a module with timed(kind), in place.
+    Call at the end of the module as instrument_module(globals(), "db").
+    """
+    module = namespace["__name__"]
+    for name, func in list(namespace.items()):
+        if (callable(func) and getattr(func, "__module__", None) == module and not name.startswith("_")
+                and name not in exclude and not isinstance(func, type)):
+            namespace[name] = timed(kind, name)(func)
+
+STATS_ROWS = 30
+
+def format_stats(limit=STATS_ROWS):
+    """
+    The busiest series as a fixed-width table for the /stats command.
+    """
+    rows = sorted(metrics.snapshot().items(), key=lambda item: item[1].count, reverse=True)[:limit]
+    if not rows:
+        return "No calls recorded yet."
+    lines = [f"{'kind':<8} {'name':<28} {'calls':>7} {'err':>4} {'p50':>7} {'p95':>7} {'p99':>7}"]
+    for (kind, name), series in rows:
+        p50, p95, p99 = (series.quantile(q) * 1000 for q in (0.5, 0.95, 0.99))
+        lines.append(f"{kind[:8]:<8} {str(name)[:28]:<28} {series.count:>7} {series.errors:>4} "
+                     f"{p50:>7.2f} {p95:>7.2f} {p99:>7.2f}")
+    lines.append("Latency in ms.")
+    return "\n".join(lines)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(listen=METRICS_LISTEN, port=METRICS_PORT):
+    """
+    Serves /metrics in Prometheus text format from a daemon thread. Does nothing without a port.
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((listen, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Metrics on http://{listen}:{port}/metrics")
+    return server
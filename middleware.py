@@ -0,0 +1,102 @@
+# middleware.py
+from telebot import types
+from telebot.handler_backends import BaseMiddleware, CancelUpdate
+import config
+from ratelimit import KeyedRateLimiter
+from handlers.admin import is_admin
+
+RATE_LIMIT_RATE = getattr(config, "RATE_LIMIT_RATE", 1)
+RATE_LIMIT_BURST = getattr(config, "RATE_LIMIT_BURST", 3)
+RATE_LIMIT_IDLE = getattr(config, "RATE_LIMIT_IDLE", 300)
+RATE_LIMIT_NOTICE_INTERVAL = 5  # seconds between slow-down notices to one user
+
+RATE_LIMIT_NOTICE_TEXT = "⏳ Slow down, please try again in a moment."
+
+def update_action(update, router=None):
+    """
+    The action an update is rate limited under: the /command for messages ("message" for
+    plain text and files) and the callback route for callback queries.
+    """
+    if isinstance(update, types.CallbackQuery):
+        if router is not None:
+            route, _, _ = router.match(update.data)
+            return "callback:" + (route or "unknown")
+        return "callback:" + (update.data or "").split("_", 1)[0]
+    text = update.text or ""
+    if text.startswith("/"):
+        return text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+    return "message"
+
+class UserRateLimit:
+    """
+    Per-user, per-action token buckets shared by the sync and async middlewares. Admins are not limited.
+    """
+
+    def __init__(self, router=None, rate=RATE_LIMIT_RATE, burst=RATE_LIMIT_BURST, idle=RATE_LIMIT_IDLE):
+        self.router = router
+        self.limiter = KeyedRateLimiter(rate, capacity=burst, idle=idle)
+        # Dropped button taps are answered so the client stops its spinner, at most one per interval
+        self.notices = KeyedRateLimiter(1 / RATE_LIMIT_NOTICE_INTERVAL, capacity=1, idle=idle)
+
+    def allows(self, update):
+        user = getattr(update, "from_user", None)
+        if user is None or is_admin(user):
+            return True
+        return self.limiter.allow((user.id, update_action(update, self.router)))
+
+    def should_notify(self, update):
+        """
+        Whether a dropped update should get a slow-down answer: callback queries only, rate limited per user.
+        """
+        return isinstance(update, types.CallbackQuery) and self.notices.allow(update.from_user.id)
+
+class RateLimitMiddleware(BaseMiddleware):
+    """
+    Drops messages and callback queries that exceed the sender's rate before any handler runs.
+    Dropped callback queries are answered with a short notice. The bot must be created with
+    use_class_middlewares=True.
+    """
+
+    def __init__(self, bot, router=None, **kwargs):
+        super().__init__()
+        self.bot = bot
+        self.update_types = ["message", "callback_query"]
+        self.limit = UserRateLimit(router, **kwargs)
+
+    def pre_process(self, update, data):
+        if not self.limit.allows(update):
+            if self.limit.should_notify(update):
+                try:
+                    self.bot.answer_callback_query(update.id, RATE_LIMIT_NOTICE_TEXT)
+                except Exception as e:
+                    print(f"Error answering rate limited callback: {e}")
+            return CancelUpdate()
+
+    def post_process(self, update, data, exception):
+        pass
+
+def create_async_rate_limit_middleware(bot, router=None, **kwargs):
+    """
+    The same middleware for AsyncTeleBot.
+    """
+    from telebot import asyncio_handler_backends
+
+    class AsyncRateLimitMiddleware(asyncio_handler_backends.BaseMiddleware):
+        def __init__(self):
+            super().__init__()
+            self.update_types = ["message", "callback_query"]
+            self.limit = UserRateLimit(router, **kwargs)
+
+        async def pre_process(self, update, data):
+            if not self.limit.allows(update):
+                if self.limit.should_notify(update):
+                    try:
+                        await bot.answer_callback_query(update.id, RATE_LIMIT_NOTICE_TEXT)
+                    except Exception as e:
+                        print(f"Error answering rate limited callback: {e}")
+                return asyncio_handler_backends.CancelUpdate()
+
+        async def post_process(self, update, data, exception):
+            pass
+
+    return AsyncRateLimitMiddleware()
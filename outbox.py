@@ -0,0 +1,173 @@
+# outbox.py
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+import config
+from cache import TTLCache
+from ratelimit import TokenBucket
+
+OUTBOX_GLOBAL_RATE = getattr(config, "OUTBOX_GLOBAL_RATE", 30)
+OUTBOX_CHAT_RATE = getattr(config, "OUTBOX_CHAT_RATE", 1)
+OUTBOX_WORKERS = getattr(config, "OUTBOX_WORKERS", 4)
+OUTBOX_MAX_RETRIES = getattr(config, "OUTBOX_MAX_RETRIES", 3)
+CHAT_BUCKET_IDLE = 60  # seconds a chat's bucket is kept after its last reserved slot
+
+def get_retry_after(error):
+    """
+    Returns Telegram's retry_after for a 429 error, or None for any other error.
+    """
+    if getattr(error, "error_code", None) != 429:
+        return None
+    result = getattr(error, "result_json", None) or {}
+    return result.get("parameters", {}).get("retry_after", 1)
+
+def call_bot(loop, func, *args, **kwargs):
+    """
+    Calls a bot method from a worker thread. With an event loop, func is an AsyncTeleBot
+    coroutine function and is run on that loop; the thread waits for its result.
+    """
+    if loop is not None:
+        return asyncio.run_coroutine_threadsafe(func(*args, **kwargs), loop).result()
+    return func(*args, **kwargs)
+
+class _Send:
+    __slots__ = ("chat_id", "func", "args", "kwargs", "loop", "tries", "reserved")
+
+    def __init__(self, chat_id, func, args, kwargs, loop):
+        self.chat_id = chat_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.loop = loop
+        self.tries = 0
+        self.reserved = False
+
+class Outbox:
+    """
+    Background queue for Bot API sends that do not need to finish inside the handler.
+    Sends go out at most `global_rate` per second overall and `chat_rate` per second per chat,
+    in submission order within a chat. A 429 reply pauses that chat for Telegram's retry_after
+    and the send is retried, up to `max_retries` times, ahead of the chat's other sends.
+    Coroutine functions (AsyncTeleBot methods) are run on the event loop they were submitted from.
+    """
+
+    def __init__(self, global_rate=OUTBOX_GLOBAL_RATE, chat_rate=OUTBOX_CHAT_RATE,
+                 workers=OUTBOX_WORKERS, max_retries=OUTBOX_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        # Idle chats drop out, so memory is bounded by recently active chats. Every reservation
+        # refreshes the entry until CHAT_BUCKET_IDLE after its debt clears (see _reserve_chat)
+        self._chat_buckets = TTLCache(maxsize=100000)
+        # Only the oldest send of each chat is in the heap (or being sent); the rest wait here
+        # in submission order, so a pause holds back every send queued behind it
+        self._heap = []
+        self._queues = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = workers
+        self._started = False
+
+    def _start(self):
+        for i in range(self._workers):
+            threading.Thread(target=self._work, name=f"outbox-{i}", daemon=True).start()
+        self._started = True
+
+    def submit(self, chat_id, func, *args, **kwargs):
+        """
+        Queues func(*args, **kwargs) as a send to chat_id and returns immediately.
+        """
+        loop = asyncio.get_running_loop() if asyncio.iscoroutinefunction(func) else None
+        self._push(_Send(chat_id, func, args, kwargs, loop), 0)
+
+    def send_message(self, bot, chat_id, text, **kwargs):
+        self.submit(chat_id, bot.send_message, chat_id, text, **kwargs)
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap) + sum(len(queue) for queue in self._queues.values())
+
+    def _push(self, send, delay):
+        with self._cond:
+            if not self._started:
+                self._start()
+            queue = self._queues.get(send.chat_id)
+            if queue is not None:
+                queue.append(send)
+                return
+            self._queues[send.chat_id] = deque()
+            self._schedule(send, delay)
+
+    def _schedule(self, send, delay):
+        # Caller holds self._cond
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), send))
+        self._cond.notify()
+
+    def _finish(self, send):
+        """
+        Schedules the next send queued for the chat once `send` is done with.
+        """
+        with self._cond:
+            queue = self._queues[send.chat_id]
+            if queue:
+                self._schedule(queue.popleft(), 0)
+            else:
+                del self._queues[send.chat_id]
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, capacity=1)
+        return bucket
+
+    def _reserve_chat(self, chat_id, pause=None):
+        """
+        Reserves the chat's next slot (or pauses the chat) and returns the seconds to wait.
+        The bucket stays cached while it holds a reservation, so the chat's next send keeps its spacing.
+        """
+        bucket = self._chat_bucket(chat_id)
+        wait = bucket.reserve() if pause is None else bucket.pause(pause)
+        self._chat_buckets.set(chat_id, bucket, ttl=wait + CHAT_BUCKET_IDLE)
+        return wait
+
+    def _next_send(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                wait = self._heap[0][0] - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                _, _, send = heapq.heappop(self._heap)
+                if send.reserved:
+                    return send
+                send.reserved = True
+                wait = self._reserve_chat(send.chat_id)
+                if not wait:
+                    return send
+                heapq.heappush(self._heap, (time.monotonic() + wait, next(self._seq), send))
+
+    def _work(self):
+        while True:
+            send = self._next_send()
+            self.global_bucket.acquire()
+            try:
+                call_bot(send.loop, send.func, *send.args, **send.kwargs)
+            except Exception as e:
+                retry_after = get_retry_after(e)
+                if retry_after is not None and send.tries < self.max_retries:
+                    # Still the chat's head: it takes the first slot after the pause
+                    send.tries += 1
+                    with self._cond:
+                        self._schedule(send, self._reserve_chat(send.chat_id, pause=retry_after))
+                    continue
+                print(f"❌ Error sending to {send.chat_id}: {e}")
+            self._finish(send)
+
+# Shared instance used by the handlers
+outbox = Outbox()
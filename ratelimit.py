@@ -0,0 +1,118 @@
+# ratelimit.py
+import threading
+import time
+from collections import deque
+from cache import TTLCache
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity` tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes `tokens` if available and returns 0, otherwise returns the seconds until they will be.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def reserve(self, tokens=1):
+        """
+        Takes `tokens` now, going into debt if needed, and returns the seconds until they are covered.
+        Successive reservations therefore get successive slots, in call order.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return max(0, -self._tokens / self.rate)
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until `tokens` are available, then takes them.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Empties the bucket and holds it empty for `seconds`, on top of any slots already reserved.
+        Returns the seconds until the bucket's debt is paid off.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+            return -self._tokens / self.rate
+
+class SlidingWindowCounter:
+    """
+    Counts events per key over the last `window` seconds and reports when a key has hit `limit`.
+    Only the newest `limit` timestamps are kept per key, and keys idle for a whole window are
+    dropped, so memory stays bounded by `maxsize` keys.
+    """
+
+    def __init__(self, limit, window, maxsize=100000):
+        self.limit = limit
+        self.window = window
+        self._events = TTLCache(maxsize=maxsize, ttl=window)
+        self._lock = threading.Lock()
+
+    def add(self, key, count=1):
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                events = deque(maxlen=self.limit)
+            events.extend([now] * min(count, self.limit))
+            self._events.set(key, events)
+
+    def retry_after(self, key):
+        """
+        Returns 0 if the key is under the limit, otherwise the seconds until it will be.
+        """
+        with self._lock:
+            events = self._events.get(key)
+            if not events or len(events) < self.limit:
+                return 0
+            return max(0, events[0] + self.window - time.monotonic())
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key (e.g. user and action), `rate` per second with bursts of `capacity`.
+    Buckets idle for `idle` seconds are dropped, which loses nothing once they have refilled,
+    and at most `maxsize` are kept.
+    """
+
+    def __init__(self, rate, capacity=None, idle=300, maxsize=100000):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = TTLCache(maxsize=maxsize, ttl=idle)
+
+    def allow(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, capacity=self.capacity)
+        # Setting on every use keeps active keys from expiring
+        self._buckets.set(key, bucket)
+        return bucket.try_acquire() == 0
+
+    def __len__(self):
+        return len(self._buckets)
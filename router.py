@@ -0,0 +1,87 @@
+# router.py
+import threading
+from metrics import timed
+
+UNKNOWN_CALLBACK_TEXT = "❓ Unknown command."
+
+class CallbackRouter:
+    """
+    Dispatches callback queries by their callback_data through one entry handler.
+    Exact routes are a dict lookup. Prefix routes are looked up by slicing the data to each
+    registered prefix length, longest first, so the cost depends on how many distinct prefix
+    lengths exist, not on how many routes there are. Prefix handlers receive the rest of the
+    data as a second argument. Unmatched callbacks are answered at once so the client stops
+    waiting. Hits are counted per route, and handler latency is recorded in metrics.
+    """
+
+    def __init__(self, bot, unknown_text=UNKNOWN_CALLBACK_TEXT):
+        self.bot = bot
+        self.unknown_text = unknown_text
+        self._exact = {}
+        self._prefixes = {}
+        self._prefix_lengths = []
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def add_exact(self, data, handler):
+        self._exact[data] = timed("callback", data)(handler)
+
+    def add_prefix(self, prefix, handler):
+        self._prefixes[prefix] = timed("callback", prefix)(handler)
+        self._prefix_lengths = sorted({len(p) for p in self._prefixes}, reverse=True)
+
+    def exact(self, data):
+        """
+        Decorator form of add_exact: @router.exact("back_main").
+        """
+        def decorator(handler):
+            self.add_exact(data, handler)
+            return handler
+        return decorator
+
+    def prefix(self, prefix):
+        """
+        Decorator form of add_prefix: @router.prefix("reward_") on handler(call, rest).
+        """
+        def decorator(handler):
+            self.add_prefix(prefix, handler)
+            return handler
+        return decorator
+
+    def _count(self, route):
+        with self._lock:
+            self._hits[route] = self._hits.get(route, 0) + 1
+
+    def match(self, data):
+        """
+        Returns (route, handler, rest) for callback data; route is None when nothing matches.
+        """
+        data = data or ""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return data, handler, None
+        for length in self._prefix_lengths:
+            prefix = data[:length]
+            handler = self._prefixes.get(prefix)
+            if handler is not None and len(data) > length:
+                return prefix, handler, data[length:]
+        return None, None, None
+
+    def dispatch(self, call):
+        """
+        Runs the handler for call.data and returns its result (a coroutine for async handlers).
+        """
+        route, handler, rest = self.match(call.data)
+        self._count(route)
+        if handler is None:
+            return self.bot.answer_callback_query(call.id, self.unknown_text)
+        if rest is None:
+            return handler(call)
+        return handler(call, rest)
+
+    def hits(self):
+        """
+        Returns {route: hits}; unmatched callbacks are counted under None.
+        """
+        with self._lock:
+            return dict(self._hits)
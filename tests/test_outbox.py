@@ -0,0 +1,70 @@
+# tests/test_outbox.py
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox
+
+class TooManyRequests(Exception):
+    """
+    Stands in for telebot's ApiTelegramException on a 429 reply.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Too Many Requests")
+        self.error_code = 429
+        self.result_json = {"parameters": {"retry_after": retry_after}}
+
+class OutboxRetryTest(unittest.TestCase):
+    def test_429_pauses_sends_queued_behind_it(self):
+        rate, retry_after = 5, 1
+        outbox = Outbox(global_rate=100, chat_rate=rate, workers=4)
+        started = time.monotonic()
+        sent = []
+        done = threading.Event()
+        failed = []
+
+        def send(n):
+            if n == 1 and not failed:
+                failed.append(time.monotonic() - started)
+                raise TooManyRequests(retry_after)
+            sent.append((n, time.monotonic() - started))
+            if len(sent) == 3:
+                done.set()
+
+        for n in (1, 2, 3):
+            outbox.submit(42, send, n)
+        self.assertTrue(done.wait(5))
+
+        self.assertEqual([n for n, _ in sent], [1, 2, 3])
+        pause_ends = failed[0] + retry_after
+        for n, at in sent:
+            self.assertGreaterEqual(at, pause_ends - 0.05, f"send {n} went out during the pause")
+        gaps = [b - a for (_, a), (_, b) in zip(sent, sent[1:])]
+        self.assertTrue(all(gap >= 1 / rate - 0.05 for gap in gaps), gaps)
+
+    def test_other_chats_are_not_paused(self):
+        outbox = Outbox(global_rate=100, chat_rate=5, workers=4)
+        started = time.monotonic()
+        sent = {}
+        done = threading.Event()
+
+        def send(chat_id):
+            if chat_id == 1 and chat_id not in sent:
+                sent[chat_id] = None
+                raise TooManyRequests(2)
+            sent[chat_id] = time.monotonic() - started
+            if chat_id == 2:
+                done.set()
+
+        outbox.submit(1, send, 1)
+        outbox.submit(2, send, 2)
+        self.assertTrue(done.wait(1))
+        self.assertLess(sent[2], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+# webhook.py
+import hmac
+import json
+import queue
+import secrets
+import threading
+import urllib.request
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import telebot
+import config
+
+WEBHOOK_LISTEN = getattr(config, "WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = getattr(config, "WEBHOOK_PORT", 8443)
+WEBHOOK_PATH = getattr(config, "WEBHOOK_PATH", "/webhook")
+WEBHOOK_URL = getattr(config, "WEBHOOK_URL", None)
+WEBHOOK_SECRET = getattr(config, "WEBHOOK_SECRET", None)
+WEBHOOK_WORKERS = getattr(config, "WEBHOOK_WORKERS", 8)
+WEBHOOK_QUEUE_SIZE = getattr(config, "WEBHOOK_QUEUE_SIZE", 1000)
+WEBHOOK_ENQUEUE_TIMEOUT = 1  # seconds to wait for queue space before refusing an update
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    """
+    Receives Telegram updates over HTTP and hands them to a fixed pool of worker threads.
+    The queue between the two is bounded: when workers fall behind, new updates are refused
+    with 503 and Telegram redelivers them later, instead of piling up in memory.
+    Every POST must carry `secret` in the X-Telegram-Bot-Api-Secret-Token header.
+    """
+
+    def __init__(self, bot, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                 secret=WEBHOOK_SECRET, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE):
+        if not secret:
+            raise ValueError("WebhookServer needs a secret token; set WEBHOOK_SECRET")
+        self.bot = bot
+        self.path = path
+        self.secret = secret.encode("utf-8")
+        self.updates = queue.Queue(maxsize=queue_size)
+        self.workers = [threading.Thread(target=self._work, name=f"webhook-worker-{i}", daemon=True)
+                        for i in range(workers)]
+        self.httpd = HTTPServer((listen, port), self._make_handler())
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                if not hmac.compare_digest(self.headers.get(SECRET_HEADER, "").encode("utf-8"), server.secret):
+                    self._reply(403)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    update = telebot.types.Update.de_json(self.rfile.read(length).decode("utf-8"))
+                except Exception:
+                    self._reply(400)
+                    return
+                try:
+                    server.updates.put(update, timeout=WEBHOOK_ENQUEUE_TIMEOUT)
+                except queue.Full:
+                    self._reply(503)
+                    return
+                self._reply(200)
+
+            def _reply(self, code):
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _work(self):
+        while True:
+            update = self.updates.get()
+            if update is None:
+                return
+            try:
+                self.bot.process_new_updates([update])
+            except Exception as e:
+                print(f"❌ Error processing update {update.update_id}: {e}")
+
+    def serve_forever(self):
+        for worker in self.workers:
+            worker.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.httpd.server_close()
+        for _ in self.workers:
+            self.updates.put(None)
+
+def run_webhook(bot):
+    """
+    Registers WEBHOOK_URL with Telegram and serves updates until interrupted.
+    Without WEBHOOK_SECRET a random secret is registered for this run; when the webhook is
+    registered elsewhere (no WEBHOOK_URL) the secret must be configured, so we refuse to start.
+    """
+    secret = WEBHOOK_SECRET
+    if WEBHOOK_URL:
+        secret = secret or secrets.token_urlsafe(32)
+        bot.remove_webhook()
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=secret, max_connections=WEBHOOK_WORKERS)
+    elif not secret:
+        raise RuntimeError("Webhook mode needs WEBHOOK_SECRET when WEBHOOK_URL is not set")
+    server = WebhookServer(bot, secret=secret)
+    print(f"Webhook server listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    server.serve_forever()
+
+def post_update(update, url=None, secret=WEBHOOK_SECRET):
+    """
+    Test client: POSTs an update dict to a running webhook server and returns the HTTP status.
+    """
+    url = url or f"http://{WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    request = urllib.request.Request(url, data=json.dumps(update).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    if secret:
+        request.add_header(SECRET_HEADER, secret)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def make_text_update(update_id, user_id, text, username="tester"):
+    """
+    Builds a synthetic private-chat message update, e.g. make_text_update(1, 42, "/start").
+    """
+    user = {"id": user_id, "is_bot": False, "first_name": username, "username": username}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": user,
+            "chat": {"id": user_id, "type": "private", "first_name": username, "username": username},
+            "date": 0,
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+            if text.startswith("/") else [],
+        },
+    }
+
+if __name__ == '__main__':
+    # Send a synthetic /start to a locally running webhook server
+    print(post_update(make_text_update(1, 1, "/start")))